@@ -11,6 +11,11 @@ uint-prefixed list of some item, defined by the function passed in
 import struct
 from collections import namedtuple
 
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
 from .mathtypes import Vector, Matrix, Quaternion, sequence_to_matrix
 
 import logging
@@ -90,6 +95,24 @@ class BaseReader(object):
     """Read a struct format from the data"""
     return struct.unpack(format, self.stream.read(struct.calcsize(format)))
 
+  def read_records(self, format, count):
+    """Reads count consecutive fixed-size records in a single read.
+
+    format is either a struct format string, in which case a list of tuples
+    is returned, or a NumPy dtype, which returns an array of count entries"""
+    if isinstance(format, str):
+      size = struct.calcsize(format)
+    elif numpy is None:
+      raise ImportError("NumPy is required to read records with a dtype")
+    else:
+      size = format.itemsize
+    data = self.stream.read(size * count)
+    if len(data) != size * count:
+      raise IOError("Unexpected end of file reading {} records of {} bytes".format(count, size))
+    if isinstance(format, str):
+      return list(struct.iter_unpack(format, data))
+    return numpy.frombuffer(data, dtype=format)
+
   def read_string(self, lookup=True):
     """Read a length-prefixed string from the file.
     lookup: If v10, string will be read as lookup. Has no effect on v8"""
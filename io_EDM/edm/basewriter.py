@@ -1,14 +1,46 @@
 
 import struct
 from collections import Counter
+from contextlib import contextmanager
 
 from .mathtypes import matrix_to_sequence
 
+class CountingStream(object):
+  """A write-only stream that discards the data, only counting its length"""
+  def __init__(self):
+    self.position = 0
+
+  def write(self, data):
+    self.position += len(data)
+
+  def tell(self):
+    return self.position
+
+  def close(self):
+    pass
+
+def _owner_label(item):
+  return "{} \"{}\"".format(type(item).__name__, getattr(item, "name", "") or "")
+
 class BaseWriter(object):
-  def __init__(self, filename=None, stream=None):
+  def __init__(self, filename=None, stream=None, dry_run=False):
+    """Writes to a file, or an existing stream. If dry_run is set, nothing
+    is written anywhere, but all of the byte accounting still happens"""
     self.filename = filename
-    self.stream = stream or open(filename, "wb")
+    if dry_run:
+      self.stream = CountingStream()
+    else:
+      self.stream = stream or open(filename, "wb")
+    # Number of objects written of each type
     self.typeLog = Counter()
+    # Bytes written, keyed on (type name, owner index). Bytes written inside a
+    # nested type only count towards the innermost one
+    self.sizeLog = Counter()
+    # Every owning object, in the order first written, indexed by identity;
+    # owners are told apart even if they share a type and name
+    self.owners = []
+    self._ownerIndex = {}
+    self._attribution = []
 
   def close(self):
     self.stream.close()
@@ -88,8 +120,86 @@ class BaseWriter(object):
 
   def write_named_type(self, item, typename=None):
     name = typename or item.forTypeName
-    self.write_string(name)
-    item.write(self)
+    with self.attribute(name, owner=item):
+      self.write_string(name)
+      item.write(self)
 
   def mark_written(self, name, count=1):
     self.typeLog[name] += count
+
+  def tell(self):
+    return self.stream.tell()
+
+  @contextmanager
+  def attribute(self, name, owner=None, count=1):
+    """Attributes all bytes written inside the block to a type name, and to
+    the owning object. If no owner is given, the current one is kept"""
+    if owner is not None:
+      owner = self._owner_index(owner)
+    elif self._attribution:
+      owner = self._attribution[-1][1]
+    start = self.stream.tell()
+    # [name, owner, bytes written by nested types]
+    self._attribution.append([name, owner, 0])
+    try:
+      yield
+    finally:
+      _, _, nested = self._attribution.pop()
+      span = self.stream.tell() - start
+      self.sizeLog[(name, owner)] += span - nested
+      if self._attribution:
+        self._attribution[-1][2] += span
+      self.mark_written(name, count)
+
+  def _owner_index(self, owner):
+    index = self._ownerIndex.get(id(owner))
+    if index is None:
+      index = len(self.owners)
+      self._ownerIndex[id(owner)] = index
+      # Holding the object keeps its id unique for the life of the writer
+      self.owners.append(owner)
+    return index
+
+  def owner_labels(self):
+    """Returns a display label for every owner, numbered where several share
+    the same type and name"""
+    labels = [_owner_label(x) for x in self.owners]
+    shared = Counter(labels)
+    seen = Counter()
+    for i, label in enumerate(labels):
+      if shared[label] > 1:
+        seen[label] += 1
+        labels[i] = "{} #{}".format(label, seen[label])
+    return labels
+
+  def size_report(self, limit=20):
+    """Returns a table of the bytes written, by type, by node category and by
+    owning object"""
+    total = self.stream.tell()
+    labels = self.owner_labels()
+    byType, byCategory, byOwner = Counter(), Counter(), Counter()
+    for (name, owner), size in self.sizeLog.items():
+      byType[name] += size
+      if owner is None:
+        byOwner["(file)"] += size
+        byCategory["(file)"] += size
+      else:
+        byOwner[labels[owner]] += size
+        category = getattr(self.owners[owner], "category", None)
+        byCategory[category.name if category is not None else "(other)"] += size
+    byType["(file structure)"] = total - sum(self.sizeLog.values())
+
+    def _table(title, sizes):
+      entries = sorted(sizes.items(), key=lambda x: (-x[1], x[0]))
+      width = max([len(x[0]) for x in entries[:limit]] + [len(title)])
+      lines = ["{:<{w}} {:>12} {:>7}".format(title, "Bytes", "%", w=width)]
+      for key, size in entries[:limit]:
+        lines.append("{:<{w}} {:>12} {:>6.1f}%".format(key, size, 100.0 * size / (total or 1), w=width))
+      if len(entries) > limit:
+        lines.append("({} more)".format(len(entries) - limit))
+      return lines
+
+    lines = ["Total size: {} bytes".format(total), ""]
+    lines += _table("Type", byType) + [""] + _table("Category", byCategory)
+    lines += [""] + _table("Object", byOwner)
+    return "\n".join(lines)
@@ -0,0 +1,312 @@
+"""
+builder
+
+A programmatic API for constructing .edm files from NumPy array data.
+
+EDMBuilder takes care of creating the transform, render and material objects,
+linking the parents, materials and node categories together in the way that
+EDMFile.write expects, and validating the input data, e.g.
+
+  builder = EDMBuilder()
+  material = builder.add_material("Crate", texture="crate_diffuse")
+  transform = builder.add_transform(matrix, name="Crate")
+  builder.add_mesh(positions, indices, normals=normals, uvs=uvs,
+                   material=material, parent=transform)
+  builder.write("crate.edm")
+
+All data is in EDM-space (Y-up). Mesh data is in the local space of its
+parent transform.
+"""
+
+import numpy as np
+
+from .types import (EDMFile, Node, TransformNode, ArgAnimationNode, ArgAnimationBase,
+                    LodNode, Connector, RenderNode, ShellNode, RootNode,
+                    PositionKey, RotationKey, KeyTrack)
+from .material_types import Material, VertexFormat, Texture
+from .propertiesset import PropertiesSet
+from .mathtypes import Matrix, Vector, Quaternion
+from .basewriter import BaseWriter
+from .geometry import calculate_normals, world_matrices
+
+# The vertex layout used for render nodes, unless the material says otherwise
+DEFAULT_VERTEX_FORMAT = {"position": 4, "normal": 3, "tex0": 2}
+
+def _to_matrix(array):
+  return Matrix([[float(x) for x in row] for row in np.asarray(array, dtype=float)])
+
+def _identity():
+  return _to_matrix(np.identity(4))
+
+def _check_array(name, array, width, count=None):
+  """Validates a (N, width) array of finite values, returning it as float"""
+  array = np.asarray(array, dtype=np.float64)
+  if array.ndim != 2 or array.shape[1] != width:
+    raise ValueError("{} must have shape (N, {}); got {}".format(name, width, array.shape))
+  if count is not None and len(array) != count:
+    raise ValueError("{} has {} entries but there are {} positions".format(name, len(array), count))
+  if not np.isfinite(array).all():
+    raise ValueError("{} contains non-finite values".format(name))
+  return array
+
+def _check_frames(name, frames):
+  """Validates the key frames of an animation track, which must be finite,
+  in ascending order and within the argument range -1 to 1"""
+  frames = _check_array(name, np.reshape(frames, (-1, 1)), 1)[:, 0]
+  if (np.diff(frames) < 0).any():
+    raise ValueError("{} must be in ascending order".format(name))
+  if len(frames) and (frames.min() < -1 or frames.max() > 1):
+    raise ValueError("{} must be in the range -1 to 1; got {} to {}".format(
+      name, frames.min(), frames.max()))
+  return frames
+
+def _check_indices(name, indices, count):
+  """Validates a triangle index array against a vertex count"""
+  indices = np.asarray(indices)
+  if not indices.dtype.kind in "ui":
+    raise ValueError("{} indices must be integers".format(name))
+  indices = indices.reshape(-1)
+  if len(indices) % 3:
+    raise ValueError("{} index count {} is not a whole number of triangles".format(name, len(indices)))
+  if len(indices) and (indices.min() < 0 or indices.max() >= count):
+    raise ValueError("{} indices out of range for {} vertices".format(name, count))
+  return indices.astype(np.uint32)
+
+def _parts(node):
+  """Yields (parent, positions) for each differently-parented part of a node"""
+  parentData = getattr(node, "parentData", None)
+  if not parentData:
+    yield node.parent, node.vertexData[:, :3]
+    return
+  start = 0
+  for parent, end, _ in parentData:
+    yield parent, node.vertexData[node.indexData[start:end], :3]
+    start = end
+
+class EDMBuilder(object):
+  """Accumulates nodes, materials and meshes, and builds them into an EDMFile"""
+
+  def __init__(self):
+    self.root = Node()
+    self.nodes = [self.root]
+    self._nodeSet = {self.root}
+    self.materials = []
+    self.renderNodes = []
+    self.shellNodes = []
+    self.connectors = []
+
+  def _parent(self, parent):
+    """Resolves a parent argument, checking that it belongs to this builder"""
+    if parent is None:
+      return self.root
+    if not parent in self._nodeSet:
+      raise ValueError("Parent {} is not a transform node of this builder".format(parent))
+    return parent
+
+  def _add_node(self, node, parent):
+    node.set_parent(self._parent(parent))
+    self.nodes.append(node)
+    self._nodeSet.add(node)
+    return node
+
+  def add_transform(self, matrix=None, parent=None, name=""):
+    """Adds a static transform node. matrix is a 4x4 array, defaulting to
+    identity. Returns the node, for use as the parent of other objects"""
+    node = TransformNode()
+    node.name = name
+    matrix = np.identity(4) if matrix is None else _check_array("matrix", matrix, 4)
+    if matrix.shape != (4, 4):
+      raise ValueError("matrix must have shape (4, 4); got {}".format(matrix.shape))
+    node.matrix = _to_matrix(matrix)
+    return self._add_node(node, parent)
+
+  def add_animation(self, parent=None, name="", matrix=None, position=(0, 0, 0),
+                    rotation=(1, 0, 0, 0), scale=(1, 1, 1),
+                    position_keys={}, rotation_keys={}):
+    """Adds an argument animation node.
+
+    matrix, position, rotation (wxyz quaternion) and scale give the base
+    transform. position_keys and rotation_keys are dictionaries of
+    argument: (frames, values), with frames an array of K ascending argument
+    values in the range -1 to 1 and values a (K,3) array of positions or
+    (K,4) array of wxyz quaternions. Raises ValueError for any other keys."""
+    node = ArgAnimationNode(name)
+    node.base = ArgAnimationBase(
+      matrix=_to_matrix(np.identity(4) if matrix is None else matrix),
+      position=Vector([float(x) for x in position]),
+      quat_1=Quaternion([float(x) for x in rotation]),
+      quat_2=Quaternion((1.0, 0.0, 0.0, 0.0)),
+      scale=Vector([float(x) for x in scale]))
+
+    for arg, (frames, values) in sorted(position_keys.items()):
+      frames = _check_frames("position frames for argument {}".format(arg), frames)
+      values = _check_array("position keys for argument {}".format(arg), values, 3, len(frames))
+      node.posData.append((arg, KeyTrack(PositionKey, 3, frames.tolist(), values.ravel().tolist())))
+    for arg, (frames, values) in sorted(rotation_keys.items()):
+      frames = _check_frames("rotation frames for argument {}".format(arg), frames)
+      values = _check_array("rotation keys for argument {}".format(arg), values, 4, len(frames))
+      node.rotData.append((arg, KeyTrack(RotationKey, 4, frames.tolist(), values.ravel().tolist())))
+    return self._add_node(node, parent)
+
+  def add_lod(self, levels, parent=None, name=""):
+    """Adds a level-of-detail node. levels is a list of (min, max) distances.
+    Returns the LodNode, and a list with a parent node for each level"""
+    node = LodNode()
+    node.name = name
+    node.level = [(float(low), float(high)) for low, high in levels]
+    self._add_node(node, parent)
+    children = [self._add_node(Node(), node) for _ in node.level]
+    return node, children
+
+  def add_connector(self, parent=None, name="", data=0):
+    """Adds a named connector attached to a transform node"""
+    connector = Connector()
+    connector.name = name
+    connector.data = data
+    connector.set_parent(self._parent(parent))
+    self.connectors.append(connector)
+    return connector
+
+  def add_material(self, name, texture=None, material_name="def_material",
+                   blending=0, uniforms=None, vertex_format=DEFAULT_VERTEX_FORMAT):
+    """Adds a material. texture is the diffuse texture name, without
+    extension. Returns the material, for use with add_mesh"""
+    mat = Material()
+    mat.name = name
+    mat.material_name = material_name
+    mat.blending = blending
+    mat.uniforms = PropertiesSet(uniforms if uniforms is not None else [
+      ("specPower", 0.49),
+      ("specFactor", 0.5),
+      ("diffuseValue", 0.8),
+      ("reflectionValue", 0.0),
+    ])
+    mat.vertex_format = VertexFormat(vertex_format)
+    mat.texture_coordinates_channels = [0] + [-1]*11
+    if texture:
+      mat.textures.append(Texture(index=0, name=texture, matrix=_identity()))
+    self.materials.append(mat)
+    return mat
+
+  def _vertex_data(self, name, positions, indices, normals, uvs, fmt):
+    """Validates mesh data and interleaves it into a vertexData array"""
+    positions = _check_array("{} positions".format(name), positions, 3)
+    count = len(positions)
+    indices = _check_indices(name, indices, count)
+
+    columns = [positions]
+    if fmt.nposition > 3:
+      columns.append(np.zeros((count, fmt.nposition - 3)))
+    if fmt.nnormal:
+      if normals is None:
+        normals = calculate_normals(positions, indices)
+      columns.append(_check_array("{} normals".format(name), normals, 3, count))
+    if fmt.ntexture:
+      if uvs is None:
+        uvs = np.zeros((count, fmt.ntexture))
+      columns.append(_check_array("{} uvs".format(name), uvs, fmt.ntexture, count))
+    return np.hstack(columns).astype(np.float32), indices
+
+  def add_mesh(self, positions, indices, normals=None, uvs=None, material=None,
+               parent=None, name="", damage_argument=-1):
+    """Adds a renderable triangle mesh.
+
+    positions and normals are (N,3) arrays, uvs an (N,2) array and indices
+    any integer array of 3*M triangle vertex indices. Normals are calculated
+    if required by the vertex format but not given, and missing texture
+    coordinates are written as zero."""
+    if material is None:
+      raise ValueError("Mesh {} has no material".format(name))
+    node = RenderNode(name)
+    node.material = material
+    node.damage_argument = damage_argument
+    node.vertexData, node.indexData = self._vertex_data(
+      name, positions, indices, normals, uvs, material.vertex_format)
+    node.set_parent(self._parent(parent))
+    self.renderNodes.append(node)
+    return node
+
+  def add_split_mesh(self, positions, indices, parts, normals=None, uvs=None,
+                     material=None, name=""):
+    """Adds a single render node that is split across several parents.
+
+    The vertex data is shared, and consecutive ranges of the index array are
+    attached to different transforms. parts is a list of (parent, end) or
+    (parent, end, damage_argument), where end is the index array position
+    that the part runs up to; the last part must end at len(indices)"""
+    if material is None:
+      raise ValueError("Mesh {} has no material".format(name))
+    if not parts:
+      raise ValueError("Split mesh {} has no parts".format(name))
+    node = RenderNode(name)
+    node.material = material
+    node.vertexData, node.indexData = self._vertex_data(
+      name, positions, indices, normals, uvs, material.vertex_format)
+
+    node.parentData = []
+    start = 0
+    for part in parts:
+      parent, end = part[0], int(part[1])
+      damage = part[2] if len(part) > 2 else -1
+      if end <= start or end % 3:
+        raise ValueError("Split mesh {} part ending at {} is not a whole, increasing number of triangles".format(name, end))
+      node.parentData.append((self._parent(parent), end, damage))
+      start = end
+    if start != len(node.indexData):
+      raise ValueError("Split mesh {} parts cover {} of {} indices".format(name, start, len(node.indexData)))
+    node.set_parent(node.parentData[0][0])
+    self.renderNodes.append(node)
+    return node
+
+  def add_shell(self, positions, indices, parent=None, name=""):
+    """Adds a collision shell from (N,3) positions and triangle indices"""
+    positions = _check_array("{} positions".format(name), positions, 3)
+    node = ShellNode(name)
+    node.vertex_format = VertexFormat({"position": 3})
+    node.vertexData = positions.astype(np.float32)
+    node.indexData = _check_indices(name, indices, len(positions))
+    node.set_parent(self._parent(parent))
+    self.shellNodes.append(node)
+    return node
+
+  def build(self):
+    """Builds an EDMFile, ready to be written"""
+    edm = EDMFile()
+    edm.nodes = list(self.nodes)
+    edm.renderNodes = list(self.renderNodes)
+    edm.shellNodes = list(self.shellNodes)
+    edm.connectors = list(self.connectors)
+
+    for i, material in enumerate(self.materials):
+      material.index = i
+    edm.root = RootNode()
+    edm.root.materials = list(self.materials)
+
+    # Calculate the bounds of all geometry in the rest pose
+    worlds = world_matrices(edm)
+    mins, maxs = [], []
+    for node in self.renderNodes + self.shellNodes:
+      for parent, positions in _parts(node):
+        if not len(positions):
+          continue
+        world = worlds[parent]
+        positions = positions.dot(world[:3, :3].T) + world[:3, 3]
+        mins.append(positions.min(axis=0))
+        maxs.append(positions.max(axis=0))
+    if mins:
+      edm.root.boundingBoxMin = Vector([float(x) for x in np.min(mins, axis=0)])
+      edm.root.boundingBoxMax = Vector([float(x) for x in np.max(maxs, axis=0)])
+    else:
+      edm.root.boundingBoxMin = Vector([0.0, 0.0, 0.0])
+      edm.root.boundingBoxMax = Vector([0.0, 0.0, 0.0])
+    return edm
+
+  def write(self, filename):
+    """Builds and writes the file in one call"""
+    edm = self.build()
+    writer = BaseWriter(filename)
+    try:
+      edm.write(writer)
+    finally:
+      writer.close()
+    return edm
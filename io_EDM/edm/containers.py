@@ -0,0 +1,92 @@
+"""
+containers
+
+Collection types shared by the graph structures of the edm object model and
+the translation graph.
+"""
+
+from collections import OrderedDict
+from itertools import islice
+
+class OrderedSet(object):
+  """An insertion-ordered collection of unique, hashable items.
+
+  Used in place of a list for child and node collections, as it supports
+  the list operations those use (append, remove, in, iteration, len and
+  indexing the ends) but with membership tests and removal in constant time.
+  Iteration order is the order items were appended, so anything written out
+  by walking it stays deterministic."""
+  __slots__ = ("_items",)
+
+  def __init__(self, items=()):
+    self._items = OrderedDict()
+    for item in items:
+      self._items[item] = None
+
+  def append(self, item):
+    """Adds an item to the end. Items already present keep their position"""
+    self._items[item] = None
+  add = append
+
+  def extend(self, items):
+    for item in items:
+      self._items[item] = None
+
+  def remove(self, item):
+    """Removes an item, raising ValueError if not present, as list does"""
+    try:
+      del self._items[item]
+    except KeyError:
+      raise ValueError("{} not in collection".format(item))
+
+  def discard(self, item):
+    self._items.pop(item, None)
+
+  def clear(self):
+    self._items.clear()
+
+  def copy(self):
+    return OrderedSet(self._items)
+  __copy__ = copy
+
+  def __contains__(self, item):
+    return item in self._items
+
+  def __iter__(self):
+    return iter(self._items)
+
+  def __reversed__(self):
+    return reversed(self._items)
+
+  def __len__(self):
+    return len(self._items)
+
+  def __getitem__(self, index):
+    """Indexing is constant time for the first and last items, and linear
+    otherwise"""
+    if isinstance(index, slice):
+      return list(self._items)[index]
+    count = len(self._items)
+    if index < 0:
+      index += count
+    if not 0 <= index < count:
+      raise IndexError("OrderedSet index out of range")
+    if index == count - 1:
+      return next(reversed(self._items))
+    return next(islice(self._items, index, None))
+
+  def __eq__(self, other):
+    if isinstance(other, OrderedSet):
+      return list(self) == list(other)
+    if isinstance(other, list):
+      return list(self) == other
+    return NotImplemented
+
+  def __ne__(self, other):
+    result = self.__eq__(other)
+    return result if result is NotImplemented else not result
+
+  __hash__ = None
+
+  def __repr__(self):
+    return "OrderedSet({!r})".format(list(self._items))
@@ -0,0 +1,112 @@
+"""
+convert
+
+Conversion of .edm files to and from common interchange formats without
+blender, for batch use by e.g. the utils/convert.py command line tool.
+"""
+
+import os
+from functools import partial
+from traceback import format_exc
+
+from .types import EDMFile
+from .basewriter import BaseWriter
+from .builder import EDMBuilder
+from .parallel import parallel_map
+from .gltf import write_gltf, read_gltf
+from .obj import write_obj, read_obj
+
+_writers = {".gltf": write_gltf, ".obj": write_obj}
+_readers = {".gltf": read_gltf, ".glb": read_gltf, ".obj": read_obj}
+
+def compile_scene(scene):
+  """Builds an EDMFile, ready for writing, from a Scene description"""
+  builder = EDMBuilder()
+
+  # Transform nodes. Parents must be added before their children
+  transforms = [None] * len(scene.nodes)
+  def _transform(index):
+    if transforms[index] is None:
+      source = scene.nodes[index]
+      parent = _transform(source.parent) if source.parent is not None else None
+      transforms[index] = builder.add_transform(source.matrix, parent=parent, name=source.name)
+    return transforms[index]
+  for index in range(len(scene.nodes)):
+    _transform(index)
+
+  materials = [builder.add_material(x.name, texture=x.texture, material_name=x.material_name)
+               for x in scene.materials]
+  default_material = None
+
+  for mesh in scene.meshes:
+    parent = transforms[mesh.node] if mesh.node is not None else None
+    if mesh.shell:
+      builder.add_shell(mesh.positions, mesh.indices, parent=parent, name=mesh.name)
+      continue
+    if mesh.material is not None:
+      material = materials[mesh.material]
+    else:
+      if default_material is None:
+        default_material = builder.add_material("Default")
+      material = default_material
+    builder.add_mesh(mesh.positions, mesh.indices, normals=mesh.normals, uvs=mesh.uvs,
+                     material=material, parent=parent, name=mesh.name)
+
+  return builder.build()
+
+def write_edm(edm, filename):
+  """Writes an EDMFile to disk"""
+  writer = BaseWriter(filename)
+  try:
+    edm.write(writer)
+  finally:
+    writer.close()
+
+def find_jobs(inputs, output, extension, sources):
+  """Builds a list of (source, target) filename pairs from input files and
+  directories. Directories are searched recursively for files with an
+  extension in sources, and their structure mirrored in output. Every target
+  is given the new extension."""
+  jobs = []
+  for path in inputs:
+    if os.path.isdir(path):
+      for dirpath, _, filenames in os.walk(path):
+        for name in sorted(filenames):
+          if os.path.splitext(name)[1].lower() in sources:
+            relative = os.path.relpath(os.path.join(dirpath, name), path)
+            jobs.append((os.path.join(dirpath, name), os.path.join(output or path, relative)))
+    else:
+      jobs.append((path, os.path.join(output or os.path.dirname(path), os.path.basename(path))))
+  # Swap the extension on every target
+  return [(src, os.path.splitext(dst)[0] + extension) for src, dst in jobs]
+
+def convert_file(source, target, options={}):
+  """Converts a single file. The direction and format is chosen by the
+  filename extensions; either from .edm to a writable format, or from a
+  readable format to .edm. options are passed through to the format writer
+  or reader."""
+  ext = os.path.splitext(target)[1].lower()
+  if ext == ".edm":
+    srcExt = os.path.splitext(source)[1].lower()
+    if not srcExt in _readers:
+      raise IOError("Do not know how to read files of type '{}'".format(srcExt))
+    write_edm(compile_scene(_readers[srcExt](source, **options)), target)
+    return
+  if not ext in _writers:
+    raise IOError("Do not know how to write files of type '{}'".format(ext))
+  _writers[ext](EDMFile(source), target, **options)
+
+def _convert_job(job, options):
+  """Worker entry point. Returns an error description, or None on success"""
+  source, target = job
+  try:
+    convert_file(source, target, options)
+  except Exception:
+    return format_exc()
+  return None
+
+def convert_files(jobs, options={}, processes=None):
+  """Converts a list of (source, target) filename pairs with a worker pool.
+  Returns a list of (source, error) for every conversion that failed."""
+  results = parallel_map(partial(_convert_job, options=options), jobs, processes)
+  return [(job[0], error) for job, error in zip(jobs, results) if error]
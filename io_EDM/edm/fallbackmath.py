@@ -0,0 +1,308 @@
+"""
+fallbackmath
+
+NumPy-backed stand-ins for the blender mathutils Vector, Matrix and
+Quaternion types, used by edm.mathtypes when mathutils is not available.
+
+Only the subset of mathutils used by the add-on is provided, following the
+blender 2.7x conventions: '*' is matrix/quaternion multiplication, a 4x4
+Matrix times a 3D Vector transforms it as a point, Matrix() is the 4x4
+identity and Vector() the 3D zero vector. Vector and Quaternion are
+(immutable) tuple subclasses so that they are cheap to create in bulk while
+reading files; Matrix wraps a 2D array whose rows can be assigned to.
+Everything can be pickled, so parsed files can be passed between processes.
+"""
+
+import math
+import numbers
+
+import numpy
+
+class Vector(tuple):
+  def __new__(cls, seq=(0.0, 0.0, 0.0)):
+    return super(Vector, cls).__new__(cls, seq)
+
+  def __repr__(self):
+    return "Vector({})".format(super(Vector, self).__repr__())
+
+  def __add__(self, other):
+    return Vector(a + b for a, b in zip(self, other))
+
+  def __sub__(self, other):
+    return Vector(a - b for a, b in zip(self, other))
+
+  def __neg__(self):
+    return Vector(-a for a in self)
+
+  def __mul__(self, other):
+    if isinstance(other, numbers.Number):
+      return Vector(a * other for a in self)
+    # Vector * Vector is the dot product, as in mathutils
+    if isinstance(other, Vector):
+      return self.dot(other)
+    return NotImplemented
+
+  def __rmul__(self, other):
+    if isinstance(other, numbers.Number):
+      return Vector(a * other for a in self)
+    return NotImplemented
+
+  def __truediv__(self, other):
+    return Vector(a / other for a in self)
+
+  def dot(self, other):
+    return sum(a * b for a, b in zip(self, other))
+
+  def cross(self, other):
+    return Vector(numpy.cross(self, other).tolist())
+
+  @property
+  def length(self):
+    return math.sqrt(self.dot(self))
+
+  @property
+  def length_squared(self):
+    return self.dot(self)
+
+  def normalized(self):
+    length = self.length
+    return Vector(a / length for a in self) if length else Vector(self)
+
+  def copy(self):
+    return Vector(self)
+
+  def to_tuple(self):
+    return tuple(self)
+
+  def to_3d(self):
+    return Vector((tuple(self) + (0.0, 0.0, 0.0))[:3])
+
+  def to_4d(self):
+    return Vector((tuple(self) + (0.0, 0.0, 0.0, 1.0)[len(self):])[:4])
+
+  x = property(lambda self: self[0])
+  y = property(lambda self: self[1])
+  z = property(lambda self: self[2])
+  w = property(lambda self: self[3])
+
+class Quaternion(tuple):
+  """A wxyz quaternion"""
+  def __new__(cls, seq=(1.0, 0.0, 0.0, 0.0)):
+    return super(Quaternion, cls).__new__(cls, seq)
+
+  def __repr__(self):
+    return "Quaternion({})".format(super(Quaternion, self).__repr__())
+
+  def __mul__(self, other):
+    if isinstance(other, Quaternion):
+      aw, ax, ay, az = self
+      bw, bx, by, bz = other
+      return Quaternion((aw*bw - ax*bx - ay*by - az*bz,
+                         aw*bx + ax*bw + ay*bz - az*by,
+                         aw*by - ax*bz + ay*bw + az*bx,
+                         aw*bz + ax*by - ay*bx + az*bw))
+    if isinstance(other, Vector):
+      return self.to_matrix() * other
+    if isinstance(other, numbers.Number):
+      return Quaternion(a * other for a in self)
+    return NotImplemented
+
+  def __neg__(self):
+    return Quaternion(-a for a in self)
+
+  @property
+  def magnitude(self):
+    return math.sqrt(sum(a * a for a in self))
+
+  def normalized(self):
+    length = self.magnitude
+    return Quaternion(a / length for a in self) if length else Quaternion(self)
+
+  def conjugated(self):
+    w, x, y, z = self
+    return Quaternion((w, -x, -y, -z))
+
+  def inverted(self):
+    lengthSq = sum(a * a for a in self)
+    return Quaternion(a / lengthSq for a in self.conjugated())
+
+  def copy(self):
+    return Quaternion(self)
+
+  def to_matrix(self):
+    """The 3x3 rotation Matrix. As in mathutils, the quaternion is not
+    normalised first"""
+    w, x, y, z = self
+    return Matrix([
+      [1 - 2*(y*y + z*z),     2*(x*y - z*w),     2*(x*z + y*w)],
+      [    2*(x*y + z*w), 1 - 2*(x*x + z*z),     2*(y*z - x*w)],
+      [    2*(x*z - y*w),     2*(y*z + x*w), 1 - 2*(x*x + y*y)]])
+
+  w = property(lambda self: self[0])
+  x = property(lambda self: self[1])
+  y = property(lambda self: self[2])
+  z = property(lambda self: self[3])
+
+def _rotation_to_quaternion(m):
+  """Converts an orthonormal 3x3 array to a Quaternion, with the same branch
+  choices as blender's mat3_normalized_to_quat"""
+  trace = 0.25 * (1 + m[0, 0] + m[1, 1] + m[2, 2])
+  if trace > 1e-7:
+    s = math.sqrt(trace)
+    q = [s, (m[2, 1] - m[1, 2]) / (4*s), (m[0, 2] - m[2, 0]) / (4*s), (m[1, 0] - m[0, 1]) / (4*s)]
+  elif m[0, 0] > m[1, 1] and m[0, 0] > m[2, 2]:
+    s = 2 * math.sqrt(max(0.0, 1 + m[0, 0] - m[1, 1] - m[2, 2]))
+    q = [(m[2, 1] - m[1, 2]) / s, 0.25 * s, (m[0, 1] + m[1, 0]) / s, (m[0, 2] + m[2, 0]) / s]
+  elif m[1, 1] > m[2, 2]:
+    s = 2 * math.sqrt(max(0.0, 1 + m[1, 1] - m[0, 0] - m[2, 2]))
+    q = [(m[0, 2] - m[2, 0]) / s, (m[0, 1] + m[1, 0]) / s, 0.25 * s, (m[1, 2] + m[2, 1]) / s]
+  else:
+    s = 2 * math.sqrt(max(0.0, 1 + m[2, 2] - m[0, 0] - m[1, 1]))
+    q = [(m[1, 0] - m[0, 1]) / s, (m[0, 2] + m[2, 0]) / s, (m[1, 2] + m[2, 1]) / s, 0.25 * s]
+  return Quaternion(float(x) for x in q).normalized()
+
+class Matrix(object):
+  """A square matrix, indexed as matrix[row][column]"""
+  __slots__ = ("_m",)
+
+  def __init__(self, rows=None):
+    if rows is None:
+      self._m = numpy.identity(4)
+      return
+    if not isinstance(rows, (list, tuple)):
+      rows = list(rows)
+    try:
+      self._m = numpy.array(rows, dtype=float)
+    except (TypeError, ValueError):
+      # e.g. rows that are generators
+      self._m = numpy.array([list(row) for row in rows], dtype=float)
+
+  @classmethod
+  def _wrap(cls, array):
+    matrix = cls.__new__(cls)
+    matrix._m = array
+    return matrix
+
+  @classmethod
+  def Identity(cls, size):
+    return cls._wrap(numpy.identity(size))
+
+  @classmethod
+  def Translation(cls, vector):
+    matrix = numpy.identity(4)
+    matrix[:3, 3] = list(vector)[:3]
+    return cls._wrap(matrix)
+
+  @classmethod
+  def Scale(cls, factor, size, axis=None):
+    if axis is None:
+      matrix = numpy.identity(size) * factor
+    else:
+      direction = numpy.zeros(size)
+      direction[:3] = numpy.asarray(list(axis)[:3], dtype=float)
+      direction /= numpy.linalg.norm(direction)
+      matrix = numpy.identity(size) + (factor - 1) * numpy.outer(direction, direction)
+    if size == 4:
+      matrix[3, 3] = 1.0
+    return cls._wrap(matrix)
+
+  def __reduce__(self):
+    return (Matrix, (self._m.tolist(),))
+
+  def __repr__(self):
+    return "Matrix({})".format(tuple(tuple(row) for row in self._m.tolist()))
+
+  def __len__(self):
+    return len(self._m)
+
+  def __iter__(self):
+    return iter(self._m)
+
+  def __getitem__(self, index):
+    """Rows are returned as views, so that e.g. matrix[0][1] = x works"""
+    return self._m[index]
+
+  def __setitem__(self, index, value):
+    self._m[index] = value
+
+  def __eq__(self, other):
+    if not isinstance(other, Matrix):
+      return NotImplemented
+    return self._m.shape == other._m.shape and bool((self._m == other._m).all())
+
+  def __ne__(self, other):
+    result = self.__eq__(other)
+    return result if result is NotImplemented else not result
+
+  __hash__ = None
+
+  def __mul__(self, other):
+    if isinstance(other, Matrix):
+      return Matrix._wrap(self._m.dot(other._m))
+    if isinstance(other, numbers.Number):
+      return Matrix._wrap(self._m * other)
+    if isinstance(other, (Vector, tuple, list)):
+      vector = list(other)
+      # As in mathutils, a 4x4 matrix transforms a 3D vector as a point
+      if len(self._m) == 4 and len(vector) == 3:
+        return Vector(self._m[:3].dot(vector + [1.0]).tolist())
+      return Vector(self._m.dot(vector).tolist())
+    return NotImplemented
+
+  def __rmul__(self, other):
+    if isinstance(other, numbers.Number):
+      return Matrix._wrap(self._m * other)
+    return NotImplemented
+
+  def __neg__(self):
+    return Matrix._wrap(-self._m)
+
+  def copy(self):
+    return Matrix._wrap(self._m.copy())
+
+  def transposed(self):
+    return Matrix._wrap(self._m.T.copy())
+
+  def inverted(self):
+    return Matrix._wrap(numpy.linalg.inv(self._m))
+
+  def determinant(self):
+    return float(numpy.linalg.det(self._m))
+
+  def to_3x3(self):
+    return Matrix._wrap(self._m[:3, :3].copy())
+
+  def to_4x4(self):
+    matrix = numpy.identity(4)
+    size = min(4, len(self._m))
+    matrix[:size, :size] = self._m[:size, :size]
+    return Matrix._wrap(matrix)
+
+  @property
+  def translation(self):
+    return Vector(self._m[:3, 3].tolist())
+
+  @translation.setter
+  def translation(self, vector):
+    self._m[:3, 3] = list(vector)[:3]
+
+  def to_translation(self):
+    return self.translation
+
+  def to_scale(self):
+    return self.decompose()[2]
+
+  def to_quaternion(self):
+    return self.decompose()[1]
+
+  def decompose(self):
+    """Splits into (translation Vector, rotation Quaternion, scale Vector).
+    As with mathutils, a negative determinant is put into the scale"""
+    basis = self._m[:3, :3]
+    scale = numpy.linalg.norm(basis, axis=0)
+    if numpy.linalg.det(basis) < 0:
+      scale = -scale
+    rotation = basis / numpy.where(scale != 0, scale, 1.0)
+    translation = self._m[:3, 3] if len(self._m) == 4 else numpy.zeros(3)
+    return (Vector(translation.tolist()), _rotation_to_quaternion(rotation),
+            Vector(scale.tolist()))
@@ -0,0 +1,155 @@
+"""
+geometry
+
+Extracts renderable geometry and transforms from a parsed EDMFile as NumPy
+arrays, for tools that work with models outside of blender.
+
+Everything is left in EDM-space (Y-up), and mesh data is in the local space
+of the transform node that the object is parented to.
+
+Also defines a minimal scene description, used when reading other mesh
+formats to be compiled into .edm files.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .types import (NodeCategory, TransformNode, ArgAnimationNode, LodNode,
+                    RenderNode, SkinNode, ShellNode)
+
+# A transform in a scene read from another format. parent is an index into
+# the scene nodes, or None for a top-level node
+SceneNode = namedtuple("SceneNode", ["name", "matrix", "parent"])
+# A single-material triangle mesh, attached to the scene node with index node
+# (or None). normals and uvs may be None
+SceneMesh = namedtuple("SceneMesh", ["name", "node", "positions", "normals", "uvs",
+                                     "indices", "material", "shell"])
+# texture is the texture name without extension, or None
+SceneMaterial = namedtuple("SceneMaterial", ["name", "texture", "material_name"])
+Scene = namedtuple("Scene", ["nodes", "meshes", "materials"])
+
+def quaternion_to_matrix(quat):
+  """Converts a wxyz quaternion to a 4x4 rotation matrix"""
+  w, x, y, z = quat
+  return np.array([
+    [1 - 2*(y*y + z*z),     2*(x*y - z*w),     2*(x*z + y*w), 0],
+    [    2*(x*y + z*w), 1 - 2*(x*x + z*z),     2*(y*z - x*w), 0],
+    [    2*(x*z - y*w),     2*(y*z + x*w), 1 - 2*(x*x + y*y), 0],
+    [                0,                 0,                 0, 1]])
+
+def translation_matrix(vector):
+  mat = np.identity(4)
+  mat[:3, 3] = vector[:3]
+  return mat
+
+def scale_matrix(vector):
+  return np.diag([vector[0], vector[1], vector[2], 1.0])
+
+def node_local_matrix(node):
+  """Returns the rest-pose local transform of a transform node as a 4x4 array.
+
+  Animation nodes are evaluated in their base position, e.g. as
+    matrix * Translation(position) * quat_1 * Scale(scale)"""
+  if isinstance(node, TransformNode):
+    return np.array([list(row) for row in node.matrix], dtype=float)
+  if isinstance(node, ArgAnimationNode):
+    base = node.base
+    return np.array([list(row) for row in base.matrix], dtype=float) \
+      .dot(translation_matrix(base.position)) \
+      .dot(quaternion_to_matrix(base.quat_1)) \
+      .dot(scale_matrix(base.scale))
+  return np.identity(4)
+
+def world_matrices(edm):
+  """Calculates the rest-pose world matrix of every transform node in a file.
+  Returns a dictionary of node: 4x4 matrix"""
+  worlds = {}
+  for node in edm.nodes:
+    # Collect every ancestor not yet calculated, then resolve top-down
+    chain = []
+    while node is not None and node not in worlds:
+      chain.append(node)
+      node = node.parent
+    parent = worlds[node] if node is not None else np.identity(4)
+    for entry in reversed(chain):
+      parent = parent.dot(node_local_matrix(entry))
+      worlds[entry] = parent
+  return worlds
+
+def lod_levels(edm):
+  """Finds the LOD level of every transform node directly below an LodNode.
+  Returns a dictionary of node: (level index, (min distance, max distance))"""
+  levels = {}
+  for node in edm.nodes:
+    if not isinstance(node, LodNode):
+      continue
+    children = [x for x in node.children if x.category is NodeCategory.transform]
+    for i, (child, distances) in enumerate(zip(children, node.level)):
+      levels[child] = (i, distances)
+  return levels
+
+def lod_level_of(node, levels):
+  """Returns the LOD level index that a node belongs to, or None if it is not
+  beneath an LodNode. levels is the dictionary returned by lod_levels"""
+  while node is not None:
+    if node in levels:
+      return levels[node][0]
+    node = node.parent
+  return None
+
+def get_vertex_format(node):
+  """Returns the VertexFormat describing a renderable nodes vertexData"""
+  if isinstance(node, ShellNode):
+    return node.vertex_format
+  return node.material.vertex_format
+
+def iterate_renderables(edm, shells=False):
+  """Iterates every node in a file that has mesh data; render nodes, and
+  optionally collision shells"""
+  for node in edm.renderNodes:
+    if isinstance(node, (RenderNode, SkinNode)) and len(node.indexData):
+      yield node
+  if shells:
+    for node in edm.shellNodes:
+      if isinstance(node, ShellNode) and len(node.indexData):
+        yield node
+
+def mesh_arrays(node, vertex_cache=None):
+  """Extracts the mesh data of a renderable node.
+
+  Returns a tuple of (positions, normals, uvs, indices), reduced to only the
+  vertices that the node's index data refers to - split render nodes all
+  share the complete original vertex array. normals and uvs are None if the
+  vertex format does not contain them.
+
+  If a dictionary is passed as vertex_cache, the array conversion of vertex
+  data shared between several nodes is only done once."""
+  fmt = get_vertex_format(node)
+  key = id(node.vertexData)
+  if vertex_cache is not None and key in vertex_cache:
+    vertices = vertex_cache[key][1]
+  else:
+    vertices = np.asarray(node.vertexData, dtype=np.float32)
+    if vertex_cache is not None:
+      # Keep the source alive so that the id remains unique
+      vertex_cache[key] = (node.vertexData, vertices)
+
+  used, indices = np.unique(np.asarray(node.indexData, dtype=np.int64), return_inverse=True)
+  vertices = vertices[used]
+
+  positions = vertices[:, fmt.position_indices]
+  normals = vertices[:, fmt.normal_indices] if fmt.nnormal else None
+  uvs = vertices[:, fmt.texture_indices[:2]] if fmt.ntexture >= 2 else None
+  return positions, normals, uvs, indices.astype(np.uint32)
+
+def calculate_normals(positions, indices):
+  """Calculates smooth, area-weighted vertex normals for a triangle mesh"""
+  triangles = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+  corners = positions[triangles]
+  faceNormals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+  normals = np.zeros((len(positions), 3))
+  for i in range(3):
+    np.add.at(normals, triangles[:, i], faceNormals)
+  lengths = np.linalg.norm(normals, axis=1)
+  return (normals / np.where(lengths > 0, lengths, 1.0)[:, np.newaxis]).astype(np.float32)
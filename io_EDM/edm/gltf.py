@@ -0,0 +1,335 @@
+"""
+gltf
+
+Writing of parsed EDM files as glTF 2.0, as a .gltf JSON document with the
+binary data in a .bin file alongside it, and reading of glTF 2.0 (.gltf or
+.glb) files into a Scene description for compiling to .edm.
+
+Both EDM and glTF are Y-up, so no axis conversion is done. The transform
+hierarchy is kept, with each animation node written in its base position.
+"""
+
+import base64
+import json
+import os
+import struct
+
+import numpy as np
+
+from .types import Connector, ShellNode
+from .geometry import (node_local_matrix, iterate_renderables, mesh_arrays,
+                       lod_levels, lod_level_of, quaternion_to_matrix,
+                       translation_matrix, scale_matrix,
+                       Scene, SceneNode, SceneMesh, SceneMaterial)
+
+# glTF accessor component types and buffer view targets
+_FLOAT = 5126
+_UNSIGNED_SHORT = 5123
+_UNSIGNED_INT = 5125
+_ARRAY_BUFFER = 34962
+_ELEMENT_ARRAY_BUFFER = 34963
+
+_accessorTypes = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4"}
+_accessorWidths = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+_componentTypes = {5120: np.int8, 5121: np.uint8, 5122: np.int16,
+                   5123: np.uint16, 5125: np.uint32, 5126: np.float32}
+_TRIANGLES = 4
+
+class _BufferBuilder(object):
+  """Accumulates binary data, and the bufferViews/accessors describing it"""
+  def __init__(self):
+    self.data = bytearray()
+    self.bufferViews = []
+    self.accessors = []
+
+  def add(self, array, target, minmax=False):
+    """Adds an array to the buffer. Returns the new accessor index"""
+    if array.dtype == np.float32:
+      componentType = _FLOAT
+    elif array.dtype == np.uint16:
+      componentType = _UNSIGNED_SHORT
+    else:
+      array = array.astype(np.uint32)
+      componentType = _UNSIGNED_INT
+    array = np.ascontiguousarray(array)
+
+    # All views are kept 4-byte aligned
+    self.data.extend(bytes(-len(self.data) % 4))
+    self.bufferViews.append({
+      "buffer": 0,
+      "byteOffset": len(self.data),
+      "byteLength": array.nbytes,
+      "target": target,
+    })
+    self.data.extend(array.tobytes())
+
+    width = array.shape[1] if array.ndim > 1 else 1
+    accessor = {
+      "bufferView": len(self.bufferViews) - 1,
+      "componentType": componentType,
+      "count": len(array),
+      "type": _accessorTypes[width],
+    }
+    if minmax:
+      accessor["min"] = [float(x) for x in array.reshape(len(array), width).min(axis=0)]
+      accessor["max"] = [float(x) for x in array.reshape(len(array), width).max(axis=0)]
+    self.accessors.append(accessor)
+    return len(self.accessors) - 1
+
+def _matrix_entry(matrix):
+  """Returns a glTF node matrix entry (column-major), or None if identity"""
+  if np.allclose(matrix, np.identity(4)):
+    return None
+  return [float(x) for x in matrix.T.flatten()]
+
+def _build_materials(edm, texture_extension):
+  """Builds the glTF materials, textures and images lists"""
+  materials = []
+  textures = []
+  images = {}
+  for material in edm.root.materials:
+    entry = {
+      "name": material.name,
+      "pbrMetallicRoughness": {"metallicFactor": 0.0},
+      "extras": {"edm_material": material.material_name,
+                 "blending": material.blending},
+    }
+    diffuse = [x for x in material.textures if x.index == 0]
+    if diffuse:
+      name = diffuse[0].name
+      if not name in images:
+        images[name] = len(images)
+        textures.append({"source": images[name]})
+      entry["pbrMetallicRoughness"]["baseColorTexture"] = {"index": images[name]}
+    if material.blending:
+      entry["alphaMode"] = "BLEND"
+    materials.append(entry)
+  imageList = [{"uri": name + texture_extension}
+               for name, _ in sorted(images.items(), key=lambda x: x[1])]
+  return materials, textures, imageList
+
+def write_gltf(edm, filename, lod=None, shells=False, texture_extension=".png"):
+  """Writes a parsed EDMFile as glTF.
+
+  lod: If given, only this level of any LOD nodes is written
+  shells: Whether collision shells should be written as meshes
+  texture_extension: Appended to EDM texture names to make image URIs"""
+  binName = os.path.splitext(os.path.basename(filename))[0] + ".bin"
+  buffers = _BufferBuilder()
+  levels = lod_levels(edm)
+
+  def _included(node):
+    return lod is None or lod_level_of(node, levels) in (None, lod)
+
+  # Create a node for every transform, keeping the hierarchy
+  nodes = []
+  nodeIndex = {}
+  for tfnode in edm.nodes:
+    if not _included(tfnode):
+      continue
+    entry = {"name": tfnode.name or type(tfnode).__name__}
+    matrix = _matrix_entry(node_local_matrix(tfnode))
+    if matrix:
+      entry["matrix"] = matrix
+    if tfnode in levels:
+      entry["extras"] = {"lod": list(levels[tfnode][1])}
+    nodeIndex[tfnode] = len(nodes)
+    nodes.append(entry)
+  for tfnode in edm.nodes:
+    if tfnode in nodeIndex and tfnode.parent is not None:
+      nodes[nodeIndex[tfnode.parent]].setdefault("children", []).append(nodeIndex[tfnode])
+
+  def _attach(entry, parent):
+    nodes.append(entry)
+    nodes[nodeIndex[parent]].setdefault("children", []).append(len(nodes) - 1)
+
+  # Now each mesh, as a child of the owning transform
+  for i, material in enumerate(edm.root.materials):
+    material.index = i
+  meshes = []
+  vertex_cache = {}
+  for node in iterate_renderables(edm, shells=shells):
+    if not node.parent in nodeIndex:
+      continue
+    positions, normals, uvs, indices = mesh_arrays(node, vertex_cache)
+    if len(positions) < 2**16:
+      indices = indices.astype(np.uint16)
+    attributes = {"POSITION": buffers.add(positions, _ARRAY_BUFFER, minmax=True)}
+    if normals is not None:
+      attributes["NORMAL"] = buffers.add(normals, _ARRAY_BUFFER)
+    if uvs is not None:
+      attributes["TEXCOORD_0"] = buffers.add(uvs, _ARRAY_BUFFER)
+    primitive = {
+      "attributes": attributes,
+      "indices": buffers.add(indices, _ELEMENT_ARRAY_BUFFER),
+    }
+    if hasattr(node, "material"):
+      primitive["material"] = node.material.index
+    meshes.append({"name": node.name, "primitives": [primitive]})
+    entry = {"name": node.name, "mesh": len(meshes) - 1}
+    if isinstance(node, ShellNode):
+      entry["extras"] = {"edm_shell": True}
+    _attach(entry, node.parent)
+
+  for connector in edm.connectors:
+    if isinstance(connector, Connector) and connector.parent in nodeIndex:
+      _attach({"name": connector.name, "extras": {"edm_connector": True}}, connector.parent)
+
+  materials, textures, images = _build_materials(edm, texture_extension)
+
+  document = {
+    "asset": {"version": "2.0", "generator": "io_EDM"},
+    "scene": 0,
+    "scenes": [{"nodes": [nodeIndex[edm.nodes[0]]]}],
+    "nodes": nodes,
+  }
+  if meshes:
+    document["meshes"] = meshes
+    document["buffers"] = [{"uri": binName, "byteLength": len(buffers.data)}]
+    document["bufferViews"] = buffers.bufferViews
+    document["accessors"] = buffers.accessors
+  if materials:
+    document["materials"] = materials
+  if textures:
+    document["textures"] = textures
+    document["images"] = images
+
+  with open(filename, "w") as f:
+    json.dump(document, f)
+  if meshes:
+    with open(os.path.join(os.path.dirname(filename), binName), "wb") as f:
+      f.write(buffers.data)
+
+
+def _load_buffers(document, filename, glbData=None):
+  """Loads the binary data for every buffer in a glTF document"""
+  buffers = []
+  for buffer in document.get("buffers", []):
+    uri = buffer.get("uri")
+    if uri is None:
+      if glbData is None:
+        raise IOError("glTF buffer has no data")
+      buffers.append(glbData)
+    elif uri.startswith("data:"):
+      buffers.append(base64.b64decode(uri.split(",", 1)[1]))
+    else:
+      with open(os.path.join(os.path.dirname(filename), uri), "rb") as f:
+        buffers.append(f.read())
+  return buffers
+
+def _read_accessor(document, buffers, index):
+  """Reads a glTF accessor as a NumPy array of shape (count,) or (count, width)"""
+  accessor = document["accessors"][index]
+  if "sparse" in accessor:
+    raise IOError("Sparse glTF accessors are not supported")
+  dtype = np.dtype(_componentTypes[accessor["componentType"]])
+  width = _accessorWidths[accessor["type"]]
+  count = accessor["count"]
+
+  view = document["bufferViews"][accessor["bufferView"]]
+  data = buffers[view["buffer"]]
+  offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+  stride = view.get("byteStride", dtype.itemsize * width)
+  # Read the strided rows as raw bytes, then reinterpret the leading part of each
+  rows = np.frombuffer(data, dtype=np.uint8, count=stride*(count-1) + dtype.itemsize*width,
+                       offset=offset) if count else np.zeros(0, dtype=np.uint8)
+  if count:
+    rows = np.lib.stride_tricks.as_strided(rows, shape=(count, dtype.itemsize*width),
+                                           strides=(stride, 1))
+  array = np.ascontiguousarray(rows).view(dtype).reshape(count, width)
+
+  if accessor.get("normalized", False) and dtype.kind in "ui":
+    array = array.astype(np.float32) / np.iinfo(dtype).max
+  return array[:, 0] if width == 1 else array
+
+def _node_matrix(node):
+  """Calculates the local matrix of a glTF node"""
+  if "matrix" in node:
+    return np.array(node["matrix"], dtype=float).reshape(4, 4).T
+  x, y, z, w = node.get("rotation", [0, 0, 0, 1])
+  return translation_matrix(node.get("translation", [0, 0, 0])) \
+    .dot(quaternion_to_matrix((w, x, y, z))) \
+    .dot(scale_matrix(node.get("scale", [1, 1, 1])))
+
+def _read_glb(filename):
+  """Reads a binary .glb container. Returns the JSON document and BIN chunk"""
+  with open(filename, "rb") as f:
+    data = f.read()
+  magic, version, length = struct.unpack("<4sII", data[:12])
+  if magic != b"glTF" or version != 2:
+    raise IOError("Not a glTF 2.0 binary file")
+  document, binary = None, None
+  offset = 12
+  while offset < length:
+    chunkLength, chunkType = struct.unpack("<I4s", data[offset:offset+8])
+    chunk = data[offset+8:offset+8+chunkLength]
+    if chunkType == b"JSON":
+      document = json.loads(chunk.decode("utf-8"))
+    elif chunkType == b"BIN\x00":
+      binary = chunk
+    offset += 8 + chunkLength
+  return document, binary
+
+def read_gltf(filename, shell_prefix="collision"):
+  """Reads a glTF 2.0 .gltf or .glb file into a Scene.
+
+  Every triangle primitive becomes a separate SceneMesh. Meshes are read as
+  collision shells if their node is marked with an 'edm_shell' extra, or
+  has a name starting with shell_prefix (case insensitive)."""
+  if filename.lower().endswith(".glb"):
+    document, binary = _read_glb(filename)
+  else:
+    with open(filename) as f:
+      document, binary = json.load(f), None
+  buffers = _load_buffers(document, filename, binary)
+
+  # Resolve each node's parent
+  parents = {}
+  for i, node in enumerate(document.get("nodes", [])):
+    for child in node.get("children", []):
+      parents[child] = i
+  nodes = [SceneNode(name=node.get("name", "Node{}".format(i)),
+                     matrix=_node_matrix(node), parent=parents.get(i))
+           for i, node in enumerate(document.get("nodes", []))]
+
+  # Textures are referred to in EDM by name without extension
+  textureNames = []
+  for texture in document.get("textures", []):
+    image = document["images"][texture["source"]] if "source" in texture else {}
+    name = image.get("name") or os.path.basename(image.get("uri", ""))
+    textureNames.append(os.path.splitext(name)[0] or None)
+
+  materials = []
+  for i, material in enumerate(document.get("materials", [])):
+    baseColor = material.get("pbrMetallicRoughness", {}).get("baseColorTexture")
+    materials.append(SceneMaterial(
+      name=material.get("name", "Material{}".format(i)),
+      texture=textureNames[baseColor["index"]] if baseColor else None,
+      material_name=material.get("extras", {}).get("edm_material", "def_material")))
+
+  meshes = []
+  for nodeIndex, node in enumerate(document.get("nodes", [])):
+    if not "mesh" in node:
+      continue
+    mesh = document["meshes"][node["mesh"]]
+    shell = node.get("extras", {}).get("edm_shell", False) or \
+            nodes[nodeIndex].name.lower().startswith(shell_prefix.lower())
+    for i, primitive in enumerate(mesh["primitives"]):
+      if primitive.get("mode", _TRIANGLES) != _TRIANGLES:
+        print("Warning: Skipping non-triangle primitive in mesh {}".format(mesh.get("name")))
+        continue
+      attributes = primitive["attributes"]
+      positions = _read_accessor(document, buffers, attributes["POSITION"])
+      if "indices" in primitive:
+        indices = _read_accessor(document, buffers, primitive["indices"]).astype(np.uint32)
+      else:
+        indices = np.arange(len(positions), dtype=np.uint32)
+      name = nodes[nodeIndex].name if len(mesh["primitives"]) == 1 \
+             else "{}_{}".format(nodes[nodeIndex].name, i)
+      meshes.append(SceneMesh(
+        name=name, node=nodeIndex, positions=positions,
+        normals=_read_accessor(document, buffers, attributes["NORMAL"]) if "NORMAL" in attributes else None,
+        uvs=_read_accessor(document, buffers, attributes["TEXCOORD_0"]) if "TEXCOORD_0" in attributes else None,
+        indices=indices, material=primitive.get("material"), shell=shell))
+
+  return Scene(nodes=nodes, meshes=meshes, materials=materials)
@@ -0,0 +1,129 @@
+"""
+keyreduce
+
+Removes redundant animation keys from ArgAnimationNode tracks, e.g. of baked
+animations with one key per frame.
+
+Tracks are simplified with a Douglas-Peucker style reduction over the key
+frames: a key is only dropped if interpolating between the keys kept on
+either side of it reproduces it to within a tolerance. Positions are
+interpolated linearly, and rotations by slerp, with the error measured as a
+distance and as the angle between the rotations respectively. The first and
+last keys of a track are always kept.
+"""
+
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from .types import ArgAnimationNode, KeyTrack, PositionKey, RotationKey, key_arrays
+
+def position_errors(frames, values, start, end):
+  """The distance from every key strictly between start and end to the
+  linear interpolation of those two keys"""
+  span = frames[end] - frames[start]
+  t = (frames[start+1:end] - frames[start]) / span if span > 0 else np.zeros(end - start - 1)
+  predicted = values[start] + t[:, np.newaxis] * (values[end] - values[start])
+  return np.linalg.norm(values[start+1:end] - predicted, axis=1)
+
+def rotation_errors(frames, values, start, end):
+  """The angle, in radians, from every key strictly between start and end to
+  the slerp of those two keys. values must be normalised wxyz quaternions"""
+  span = frames[end] - frames[start]
+  t = (frames[start+1:end] - frames[start]) / span if span > 0 else np.zeros(end - start - 1)
+  q0, q1 = values[start], values[end]
+  cosine = float(q0.dot(q1))
+  if cosine < 0:
+    # Which way around the sim interpolates is ambiguous, so keep these keys
+    return np.full(end - start - 1, np.inf)
+  theta = math.acos(min(1.0, cosine))
+  if math.sin(theta) < 1e-9:
+    predicted = np.outer(1 - t, q0) + np.outer(t, q1)
+    predicted /= np.linalg.norm(predicted, axis=1)[:, np.newaxis]
+  else:
+    predicted = (np.outer(np.sin((1 - t) * theta), q0) +
+                 np.outer(np.sin(t * theta), q1)) / math.sin(theta)
+  # q and -q are the same rotation
+  dots = np.abs(np.einsum("ij,ij->i", predicted, values[start+1:end]))
+  return 2 * np.arccos(np.clip(dots, 0.0, 1.0))
+
+def reduce_keys(frames, values, tolerance, errors=position_errors):
+  """Returns a boolean mask of the keys to keep from (K,) frames and (K,W)
+  values, so that every removed key is within tolerance of the track
+  interpolated from the kept ones. errors is position_errors or
+  rotation_errors. Frames must be in ascending order"""
+  count = len(frames)
+  keep = np.zeros(count, dtype=bool)
+  if count < 3:
+    keep[:] = True
+    return keep
+  keep[0] = keep[-1] = True
+  stack = [(0, count - 1)]
+  while stack:
+    start, end = stack.pop()
+    if end - start < 2:
+      continue
+    error = errors(frames, values, start, end)
+    worst = int(np.argmax(error))
+    if error[worst] <= tolerance:
+      continue
+    split = start + 1 + worst
+    keep[split] = True
+    stack.append((split, end))
+    stack.append((start, split))
+  return keep
+
+def reduce_track(keys, keyClass, tolerance):
+  """Returns a reduced KeyTrack of PositionKey or RotationKey keys. Tracks
+  that are not in frame order are returned unchanged"""
+  width = 4 if keyClass is RotationKey else 3
+  frames, values = key_arrays(keys, width)
+  if len(frames) < 3 or (np.diff(frames) < 0).any():
+    return keys
+  if keyClass is RotationKey:
+    lengths = np.linalg.norm(values, axis=1)
+    keep = reduce_keys(frames, values / np.where(lengths > 0, lengths, 1.0)[:, np.newaxis],
+                       tolerance, rotation_errors)
+  else:
+    keep = reduce_keys(frames, values, tolerance, position_errors)
+  if keep.all():
+    return keys
+  return KeyTrack.from_arrays(keyClass, frames[keep], values[keep])
+
+def reduce_animation_keys(nodes, position_tolerance, angle_tolerance):
+  """Reduces the position and rotation keys of every ArgAnimationNode in
+  nodes, in place. angle_tolerance is in radians.
+
+  Returns an OrderedDict of (argument, "position" or "rotation"): [keys
+  before, keys after], summed over every node animated by the argument."""
+  stats = OrderedDict()
+  for node in nodes:
+    if not isinstance(node, ArgAnimationNode):
+      continue
+    for attribute, keyClass, kind, tolerance in (
+        ("posData", PositionKey, "position", position_tolerance),
+        ("rotData", RotationKey, "rotation", angle_tolerance)):
+      reduced = []
+      for arg, keys in getattr(node, attribute):
+        newKeys = reduce_track(keys, keyClass, tolerance)
+        counts = stats.setdefault((arg, kind), [0, 0])
+        counts[0] += len(keys)
+        counts[1] += len(newKeys)
+        reduced.append((arg, newKeys))
+      setattr(node, attribute, reduced)
+  return stats
+
+def reduction_report(stats):
+  """Formats the result of reduce_animation_keys as a table"""
+  lines = ["Animation key reduction:",
+           "  {:>8} {:<8} {:>8} {:>8} {:>7}".format("Argument", "Keys", "Before", "After", "Removed")]
+  totals = [0, 0]
+  for (arg, kind), (before, after) in sorted(stats.items()):
+    lines.append("  {:>8} {:<8} {:>8} {:>8} {:>6.1f}%".format(
+      arg, kind, before, after, 100.0 * (before - after) / before if before else 0.0))
+    totals[0] += before
+    totals[1] += after
+  lines.append("  {:>8} {:<8} {:>8} {:>8} {:>6.1f}%".format(
+    "Total", "", totals[0], totals[1], 100.0 * (totals[0] - totals[1]) / totals[0] if totals[0] else 0.0))
+  return "\n".join(lines)
@@ -128,7 +128,7 @@ class ShadowSettings(object):
   @property
   def value(self):
     return (1 if self.cast else 0) + \
-           (2 if self.recieve else 0) + \
+           (2 if self.receive else 0) + \
            (4 if self.cast_only else 0)
 
   def __repr__(self):
@@ -136,7 +136,7 @@ class ShadowSettings(object):
     if self.cast:
       args.append("cast=True")
     if self.receive:
-      args.append("recieve=True")
+      args.append("receive=True")
     if self.cast_only:
       args.append("cast_only=True")
     return "ShadowSettings(" + ", ".join(args) + ")"
@@ -2,31 +2,42 @@
 Simple math types to represent Vector, Matrix, Quaternion
 
 If the blender mathutils module is available, the blender API types are
-used, but otherwise a (minimally) compatible internal type is used instead.
+used, but otherwise the compatible NumPy-backed types from fallbackmath (or,
+without NumPy, bare tuple types) are used instead.
 
 Also included are tools to create from simple lists, and convert between the
-EDM and blender axis interpretations.
+EDM and blender axis interpretations, both for single values and, with NumPy,
+for whole arrays of them at once.
 """
 
 import itertools
 
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
 try:
   from mathutils import Matrix, Vector, Quaternion
 except ImportError:
-  # We don't have mathutils. Make some very basic replacements.
-  class Vector(tuple):
-    def __repr__(self):
-      return "Vector({})".format(super(Vector, self).__repr__())
-  class Matrix(tuple):
-    def transposed(self):
-      cols = [[self[j][i] for j in range(len(self))] for i in range(len(self))]
-      return Matrix(cols)
-    def __repr__(self):
-      return "Matrix({})".format(super(Matrix, self).__repr__())
-
-  class Quaternion(tuple):
-    def ___repr__(self):
-      return "Quaternion({})".format(super(Quaternion, self).__repr__())
+  try:
+    # Outside of blender, use NumPy replacements with the same interface
+    from .fallbackmath import Matrix, Vector, Quaternion
+  except ImportError:
+    # We don't have NumPy either. Make some very basic replacements.
+    class Vector(tuple):
+      def __repr__(self):
+        return "Vector({})".format(super(Vector, self).__repr__())
+    class Matrix(tuple):
+      def transposed(self):
+        cols = [[self[j][i] for j in range(len(self))] for i in range(len(self))]
+        return Matrix(cols)
+      def __repr__(self):
+        return "Matrix({})".format(super(Matrix, self).__repr__())
+
+    class Quaternion(tuple):
+      def __repr__(self):
+        return "Quaternion({})".format(super(Quaternion, self).__repr__())
 
 def MatrixScale(vector):
   mat = Matrix.Scale(1,4)
@@ -44,13 +55,77 @@ def sequence_to_quaternion(seq):
   return Quaternion((seq[3], seq[0], seq[1], seq[2]))
 
 def matrix_to_blender(matrix):
-  return Matrix([matrix[0], -matrix[2], matrix[1], matrix[3]])
+  return Matrix([matrix[0], [-x for x in matrix[2]], matrix[1], matrix[3]])
 
 def matrix_to_edm(matrix):
-  return Matrix([matrix[0], matrix[2], -matrix[1], matrix[3]])
+  return Matrix([matrix[0], matrix[2], [-x for x in matrix[1]], matrix[3]])
 
 def vector_to_blender(v):
   return Vector([v[0], -v[2], v[1]])
 
 def vector_to_edm(v):
   return Vector([v[0], v[2], -v[1]])
+
+# Array versions of the above, for converting many values in one call. These
+# take and return NumPy arrays, with the vectors or matrices along the last
+# axes, e.g. (N,3) positions or (N,4,4) matrix stacks
+
+def vectors_to_blender(v):
+  """Converts an (...,3) array of EDM-space vectors to blender space"""
+  v = numpy.asarray(v)
+  out = numpy.empty_like(v)
+  out[..., 0] = v[..., 0]
+  out[..., 1] = -v[..., 2]
+  out[..., 2] = v[..., 1]
+  return out
+
+def vectors_to_edm(v):
+  """Converts an (...,3) array of blender-space vectors to EDM space"""
+  v = numpy.asarray(v)
+  out = numpy.empty_like(v)
+  out[..., 0] = v[..., 0]
+  out[..., 1] = v[..., 2]
+  out[..., 2] = -v[..., 1]
+  return out
+
+def matrices_to_blender(m):
+  """Converts an (...,4,4) stack of EDM-space matrices to blender space"""
+  m = numpy.asarray(m)
+  out = numpy.empty_like(m)
+  out[..., 0, :] = m[..., 0, :]
+  out[..., 1, :] = -m[..., 2, :]
+  out[..., 2, :] = m[..., 1, :]
+  out[..., 3, :] = m[..., 3, :]
+  return out
+
+def matrices_to_edm(m):
+  """Converts an (...,4,4) stack of blender-space matrices to EDM space"""
+  m = numpy.asarray(m)
+  out = numpy.empty_like(m)
+  out[..., 0, :] = m[..., 0, :]
+  out[..., 1, :] = m[..., 2, :]
+  out[..., 2, :] = -m[..., 1, :]
+  out[..., 3, :] = m[..., 3, :]
+  return out
+
+def quaternions_multiply(a, b):
+  """Hamilton products of wxyz quaternions, as (...,4) arrays. Either side
+  may be a single quaternion, which is applied to every one of the other"""
+  a, b = numpy.asarray(a, dtype=float), numpy.asarray(b, dtype=float)
+  aw, ax, ay, az = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+  bw, bx, by, bz = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+  return numpy.stack([
+    aw*bw - ax*bx - ay*by - az*bz,
+    aw*bx + ax*bw + ay*bz - az*by,
+    aw*by - ax*bz + ay*bw + az*bx,
+    aw*bz + ax*by - ay*bx + az*bw], axis=-1)
+
+def translation_products(left, translations, right=None):
+  """Returns the (K,3) translation parts of left * Translation(t) * right for
+  every row t of a (K,3) array, where left and right are single 4x4
+  matrices; the same as decompose()[0] of each product, without forming it"""
+  left = numpy.asarray([list(row) for row in left], dtype=float)
+  offset = numpy.asarray(translations, dtype=float).reshape(-1, 3)
+  if right is not None:
+    offset = offset + numpy.asarray([list(row) for row in right], dtype=float)[:3, 3]
+  return offset.dot(left[:3, :3].T) + left[:3, 3]
@@ -0,0 +1,201 @@
+"""
+obj
+
+Writing of parsed EDM files as Wavefront .obj geometry, with a .mtl material
+library alongside it, and reading of .obj files into a Scene description for
+compiling to .edm.
+
+OBJ has no hierarchy, so the rest-pose world transform of every object is
+baked into the written vertex data. Coordinates are left in EDM-space (Y-up).
+"""
+
+import os
+from collections import Counter
+
+import numpy as np
+
+from .geometry import (world_matrices, iterate_renderables, mesh_arrays,
+                       lod_levels, lod_level_of, Scene, SceneMesh, SceneMaterial)
+
+# How many components of each vertex data entry are used
+_widths = {"v": 3, "vt": 2, "vn": 3}
+
+def _material_name(material):
+  return (material.name or "material").replace(" ", "_")
+
+def write_mtl(edm, filename, texture_extension=".png"):
+  """Writes the materials of a parsed EDMFile as a .mtl material library"""
+  with open(filename, "w") as f:
+    for material in edm.root.materials:
+      f.write("newmtl {}\n".format(_material_name(material)))
+      f.write("Kd 1.0 1.0 1.0\n")
+      diffuse = [x for x in material.textures if x.index == 0]
+      if diffuse:
+        f.write("map_Kd {}{}\n".format(diffuse[0].name, texture_extension))
+      f.write("\n")
+
+def write_obj(edm, filename, lod=None, shells=False, texture_extension=".png"):
+  """Writes the geometry of a parsed EDMFile as .obj.
+
+  lod: If given, only this level of any LOD nodes is written
+  shells: Whether collision shells should also be written
+  texture_extension: Appended to EDM texture names for the .mtl texture maps"""
+  mtlName = os.path.splitext(os.path.basename(filename))[0] + ".mtl"
+  write_mtl(edm, os.path.join(os.path.dirname(filename), mtlName), texture_extension)
+
+  worlds = world_matrices(edm)
+  levels = lod_levels(edm)
+  vertex_cache = {}
+  # OBJ indices are global and 1-based
+  vOffset, vtOffset, vnOffset = 1, 1, 1
+
+  with open(filename, "w") as f:
+    f.write("mtllib {}\n".format(mtlName))
+    for node in iterate_renderables(edm, shells=shells):
+      if lod is not None and lod_level_of(node.parent, levels) not in (None, lod):
+        continue
+      positions, normals, uvs, indices = mesh_arrays(node, vertex_cache)
+      world = worlds.get(node.parent, np.identity(4))
+
+      f.write("o {}\n".format(node.name.replace(" ", "_") or "object"))
+      if hasattr(node, "material"):
+        f.write("usemtl {}\n".format(_material_name(node.material)))
+
+      positions = positions.dot(world[:3, :3].T) + world[:3, 3]
+      np.savetxt(f, positions, fmt="v %.6f %.6f %.6f")
+      if uvs is not None:
+        # OBJ texture coordinates have their origin at the bottom
+        np.savetxt(f, np.column_stack([uvs[:, 0], 1.0 - uvs[:, 1]]), fmt="vt %.6f %.6f")
+      if normals is not None:
+        normals = normals.dot(np.linalg.inv(world[:3, :3]))
+        lengths = np.linalg.norm(normals, axis=1)
+        normals = normals / np.where(lengths > 0, lengths, 1.0)[:, np.newaxis]
+        np.savetxt(f, normals, fmt="vn %.6f %.6f %.6f")
+
+      # Build the face index columns for each of v/vt/vn present
+      triangles = indices.reshape(-1, 3).astype(np.int64)
+      columns = [triangles + vOffset]
+      if uvs is not None or normals is not None:
+        columns.append(triangles + vtOffset if uvs is not None else None)
+      if normals is not None:
+        columns.append(triangles + vnOffset)
+      _write_faces(f, columns)
+
+      vOffset += len(positions)
+      if uvs is not None:
+        vtOffset += len(uvs)
+      if normals is not None:
+        vnOffset += len(normals)
+
+def _write_faces(f, columns):
+  """Writes triangle face lines, from a list of (N,3) index arrays for each
+  of v, vt, vn. Missing vt entries are passed as None"""
+  present = [c for c in columns if c is not None]
+  # Interleave as corner-by-corner, attribute-by-attribute
+  data = np.stack(present, axis=2).reshape(len(present[0]), -1)
+  corner = "/".join("" if c is None else "%d" for c in columns)
+  np.savetxt(f, data, fmt="f " + " ".join([corner]*3))
+
+
+def read_mtl(filename):
+  """Reads a .mtl material library. Returns a dictionary of name: texture,
+  where texture is the diffuse map name without extension, or None"""
+  materials = {}
+  current = None
+  with open(filename) as f:
+    for line in f:
+      parts = line.split()
+      if not parts:
+        continue
+      if parts[0] == "newmtl":
+        current = " ".join(parts[1:])
+        materials[current] = None
+      elif parts[0] == "map_Kd" and current is not None:
+        materials[current] = os.path.splitext(os.path.basename(parts[-1]))[0]
+  return materials
+
+def _build_mesh(name, corners, positions, uvs, normals, material, shell):
+  """Builds a SceneMesh from a (N, 3) array of v/vt/vn corner indices,
+  which are zero-based with -1 for a missing entry"""
+  # Every distinct v/vt/vn combination becomes one vertex
+  unique, indices = np.unique(corners.view([("", corners.dtype)]*3), return_inverse=True)
+  unique = unique.view(corners.dtype).reshape(-1, 3)
+  return SceneMesh(
+    name=name, node=None, material=material, shell=shell,
+    positions=positions[unique[:, 0]],
+    uvs=uvs[unique[:, 1]] if uvs is not None and (unique[:, 1] >= 0).all() else None,
+    normals=normals[unique[:, 2]] if normals is not None and (unique[:, 2] >= 0).all() else None,
+    indices=indices.reshape(-1).astype(np.uint32))
+
+def read_obj(filename, shell_prefix="collision"):
+  """Reads a Wavefront .obj file into a Scene.
+
+  Each object/group and material combination becomes a separate SceneMesh,
+  with polygons triangulated as fans. Objects with a name starting with
+  shell_prefix (case insensitive) are read as collision shells."""
+  data = {"v": [], "vt": [], "vn": []}
+  materialTextures = {}
+  materialOrder = []
+  # Triangle corner lists, keyed on (object name, material name)
+  groups = {}
+  groupOrder = []
+  objectName, materialName = os.path.splitext(os.path.basename(filename))[0], None
+
+  with open(filename) as f:
+    for line in f:
+      parts = line.split()
+      if not parts or parts[0].startswith("#"):
+        continue
+      key = parts[0]
+      if key in data:
+        data[key].append([float(x) for x in parts[1:1+_widths[key]]])
+      elif key == "f":
+        corners = []
+        for entry in parts[1:]:
+          refs = (entry.split("/") + ["", ""])[:3]
+          corner = []
+          for ref, values in zip(refs, (data["v"], data["vt"], data["vn"])):
+            if not ref:
+              corner.append(-1)
+            else:
+              index = int(ref)
+              corner.append(index - 1 if index > 0 else len(values) + index)
+          corners.append(corner)
+        group = (objectName, materialName)
+        if not group in groups:
+          groups[group] = []
+          groupOrder.append(group)
+        for i in range(1, len(corners) - 1):
+          groups[group].extend([corners[0], corners[i], corners[i+1]])
+      elif key in ("o", "g"):
+        objectName = " ".join(parts[1:]) or objectName
+      elif key == "usemtl":
+        materialName = " ".join(parts[1:])
+        if not materialName in materialOrder:
+          materialOrder.append(materialName)
+      elif key == "mtllib":
+        mtlFile = os.path.join(os.path.dirname(filename), " ".join(parts[1:]))
+        if os.path.isfile(mtlFile):
+          materialTextures.update(read_mtl(mtlFile))
+
+  positions = np.array(data["v"], dtype=np.float32).reshape(-1, 3)
+  uvs = np.array(data["vt"], dtype=np.float32).reshape(-1, 2) if data["vt"] else None
+  if uvs is not None:
+    # OBJ texture coordinates have their origin at the bottom
+    uvs[:, 1] = 1.0 - uvs[:, 1]
+  normals = np.array(data["vn"], dtype=np.float32).reshape(-1, 3) if data["vn"] else None
+
+  materials = [SceneMaterial(name=name, texture=materialTextures.get(name),
+                             material_name="def_material") for name in materialOrder]
+  materialIndex = {name: i for i, name in enumerate(materialOrder)}
+  # Objects with several materials get a mesh per material, named after both
+  objectGroups = Counter(x[0] for x in groupOrder)
+  meshes = []
+  for objectName, materialName in groupOrder:
+    corners = np.array(groups[(objectName, materialName)], dtype=np.int64)
+    name = objectName if objectGroups[objectName] == 1 \
+           else "{}_{}".format(objectName, materialName)
+    meshes.append(_build_mesh(name, corners, positions, uvs, normals,
+                              materialIndex[materialName] if materialName else None,
+                              objectName.lower().startswith(shell_prefix.lower())))
+  return Scene(nodes=[], meshes=meshes, materials=materials)
@@ -0,0 +1,58 @@
+"""
+parallel
+
+Helpers to spread independent per-file work across worker processes. As the
+edm package does not depend on blender, parsing can be done entirely in
+separate processes, with the parsed objects sent back to the caller.
+"""
+
+import os
+from contextlib import contextmanager
+from multiprocessing import spawn
+from pickle import PicklingError
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .types import EDMFile
+
+@contextmanager
+def _worker_executable(executable):
+  """Starts spawned worker processes with another python executable inside
+  the block, restoring the process-wide setting afterwards"""
+  if not executable:
+    yield
+    return
+  original = spawn.get_executable()
+  spawn.set_executable(executable)
+  try:
+    yield
+  finally:
+    spawn.set_executable(original)
+
+def parallel_map(function, items, processes=None, executable=None):
+  """Calls function for every item, in worker processes where possible.
+
+  The results are returned as a list in the same order as items. The
+  function, items and results must all be picklable. If only one process
+  would be used, or the worker pool cannot be started, the work is done
+  serially in this process instead. executable is the python interpreter
+  used for spawned workers, e.g. blender's bundled python; the default one
+  is only replaced while this pool runs."""
+  items = list(items)
+  if processes is None:
+    processes = os.cpu_count() or 1
+  processes = min(processes, len(items))
+  if processes <= 1:
+    return [function(x) for x in items]
+
+  try:
+    with _worker_executable(executable), ProcessPoolExecutor(max_workers=processes) as executor:
+      return list(executor.map(function, items))
+  except (BrokenProcessPool, PicklingError) as e:
+    print("Warning: Could not use worker processes ({}); running serially".format(e))
+    return [function(x) for x in items]
+
+def parse_files(filenames, processes=None, executable=None):
+  """Parses a list of .edm files, in parallel where possible.
+  Returns a list of EDMFile objects in the same order as filenames."""
+  return parallel_map(EDMFile, filenames, processes, executable)
@@ -0,0 +1,116 @@
+"""
+synthetic
+
+Generation of synthetic .edm files of arbitrary size, for benchmarking and
+stress testing the reader and writer without needing real models.
+
+Files are built through EDMBuilder and written with the normal writer, so
+that generating a file exercises the same write path as the exporter, and
+reading it back the same parse path as the importer. The output is fully
+deterministic for a given set of parameters and seed.
+"""
+
+import math
+
+import numpy as np
+
+from .builder import EDMBuilder
+
+def grid_mesh(vertices):
+  """Creates a gently curved, UV-mapped grid with approximately the requested
+  number of vertices. Returns (positions, normals, uvs, indices)"""
+  rows = max(2, int(math.sqrt(vertices)))
+  cols = max(2, vertices // rows)
+  u, v = np.meshgrid(np.linspace(0, 1, cols), np.linspace(0, 1, rows))
+  u, v = u.ravel(), v.ravel()
+  height = 0.1 * np.sin(u * math.pi) * np.sin(v * math.pi)
+  positions = np.column_stack([u * 2 - 1, height, v * 2 - 1])
+  uvs = np.column_stack([u, v])
+
+  # Two triangles for every grid cell
+  corner = (np.arange(rows - 1)[:, np.newaxis] * cols + np.arange(cols - 1)).ravel()
+  indices = np.column_stack([corner, corner + cols, corner + 1,
+                             corner + 1, corner + cols, corner + cols + 1]).ravel()
+
+  # Analytic normals of the height field
+  dx = 0.1 * math.pi / 2 * np.cos(u * math.pi) * np.sin(v * math.pi)
+  dz = 0.1 * math.pi / 2 * np.sin(u * math.pi) * np.cos(v * math.pi)
+  normals = np.column_stack([-dx, np.ones_like(dx), -dz])
+  normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis]
+  return positions, normals, uvs, indices.astype(np.uint32)
+
+def _animation_keys(count, phase):
+  """Creates position and rotation key arrays for one animation argument"""
+  frames = np.linspace(-1, 1, count)
+  angles = (frames + phase) * math.pi / 2
+  positions = np.column_stack([np.zeros(count), 0.5 * np.sin(angles), np.zeros(count)])
+  # Rotation about the Y axis, as wxyz quaternions
+  rotations = np.column_stack([np.cos(angles / 2), np.zeros(count),
+                               np.sin(angles / 2), np.zeros(count)])
+  return frames, positions, rotations
+
+def generate_edm(nodes=100, depth=4, vertices=100, materials=4, keys=10,
+                 animated=0.5, arguments=16, split=1, seed=0):
+  """Builds a synthetic EDMFile, ready for writing.
+
+  nodes:      Number of transform nodes, one mesh is attached to each
+  depth:      Maximum depth of the transform hierarchy below the root
+  vertices:   Approximate number of vertices in each mesh
+  materials:  Number of distinct materials, assigned in rotation
+  keys:       Number of position and rotation keys per animation argument
+  animated:   Fraction of the transform nodes that are argument animations
+  arguments:  Number of distinct animation arguments used
+  split:      Number of transforms sharing each render node. Above 1, the
+              meshes of consecutive transforms are combined into split
+              render nodes
+  seed:       Seed for the random hierarchy and animation choices"""
+  if nodes < 1 or depth < 1 or split < 1:
+    raise ValueError("nodes, depth and split must all be at least 1")
+  random = np.random.RandomState(seed)
+  builder = EDMBuilder()
+
+  mats = [builder.add_material("Material{}".format(i), texture="texture{}".format(i))
+          for i in range(max(1, materials))]
+
+  # Every node is placed at a level below the root, and parented to a random
+  # node from the level above
+  levels = [[None]] + [[] for _ in range(depth)]
+  animatedMask = random.random_sample(nodes) < animated
+  offsets = random.uniform(-10, 10, (nodes, 3))
+  transforms = []
+  for i in range(nodes):
+    level = 1 + (i % depth)
+    candidates = levels[level - 1]
+    parent = candidates[random.randint(len(candidates))]
+    matrix = np.identity(4)
+    matrix[:3, 3] = offsets[i]
+    name = "Node{}".format(i)
+    if animatedMask[i] and keys > 0:
+      frames, positions, rotations = _animation_keys(keys, random.uniform(-1, 1))
+      node = builder.add_animation(parent=parent, name=name, matrix=matrix,
+        position_keys={random.randint(arguments): (frames, positions)},
+        rotation_keys={random.randint(arguments): (frames, rotations)})
+    else:
+      node = builder.add_transform(matrix, parent=parent, name=name)
+    levels[level].append(node)
+    transforms.append(node)
+
+  positions, normals, uvs, indices = grid_mesh(vertices)
+  for start in range(0, nodes, split):
+    group = transforms[start:start + split]
+    material = mats[(start // split) % len(mats)]
+    name = "Mesh{}".format(start)
+    if len(group) == 1:
+      builder.add_mesh(positions, indices, normals=normals, uvs=uvs,
+                       material=material, parent=group[0], name=name)
+      continue
+    # Stack one copy of the grid per part, each with its own index range
+    count = len(positions)
+    builder.add_split_mesh(
+      np.tile(positions, (len(group), 1)),
+      np.concatenate([indices + i * count for i in range(len(group))]),
+      [(parent, (i + 1) * len(indices)) for i, parent in enumerate(group)],
+      normals=np.tile(normals, (len(group), 1)), uvs=np.tile(uvs, (len(group), 1)),
+      material=material, name=name)
+
+  return builder.build()
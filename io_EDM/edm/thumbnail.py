@@ -0,0 +1,200 @@
+"""
+thumbnail
+
+A small CPU-only software rasterizer for drawing flat-shaded, orthographic
+preview images of parsed EDM files without blender, e.g. for asset browsers.
+
+Geometry is drawn in the rest pose (or posed for a set of argument values)
+from an isometric-style viewpoint similar to tests/render_iso.py, and saved
+as RGBA PNG with a transparent background.
+"""
+
+import math
+import struct
+import zlib
+from functools import partial
+from traceback import format_exc
+
+import numpy as np
+
+from .types import EDMFile, ShellNode
+from .geometry import iterate_renderables, mesh_arrays, lod_levels, lod_level_of
+from .parallel import parallel_map
+from .pose import PoseEvaluator
+
+# Colours of the shaded geometry, and the direction light comes from, in view
+# space (x right, y up, z towards the viewer)
+_MESH_COLOUR = np.array([0.80, 0.80, 0.78])
+_SHELL_COLOUR = np.array([0.85, 0.25, 0.20])
+_LIGHT = np.array([-0.4, 0.6, 0.7]) / np.linalg.norm([-0.4, 0.6, 0.7])
+_AMBIENT = 0.35
+
+# Maximum number of candidate pixels tested in one batch of triangles
+_BATCH_PIXELS = 1 << 21
+
+def view_matrix(azimuth=45.0, elevation=30.0):
+  """Returns the 3x3 rotation from EDM-space (Y-up) into view space, for a
+  camera orbiting the origin by azimuth degrees and looking down by
+  elevation degrees"""
+  az, el = math.radians(azimuth), math.radians(elevation)
+  yaw = np.array([[ math.cos(az), 0, math.sin(az)],
+                  [            0, 1,            0],
+                  [-math.sin(az), 0, math.cos(az)]])
+  pitch = np.array([[1,            0,             0],
+                    [0, math.cos(el), -math.sin(el)],
+                    [0, math.sin(el),  math.cos(el)]])
+  return pitch.dot(yaw)
+
+def collect_triangles(edm, lod=0, shells=False, arguments=None):
+  """Gathers every drawn triangle of a file in EDM world space.
+
+  Returns a tuple of the (T,3,3) triangle corners and a (T,) boolean array of
+  which are collision shells. Only LOD level lod is drawn, unless lod is None.
+  If arguments (a dictionary of argument: value) are given, the model is
+  posed and hidden nodes left out, otherwise the rest pose is drawn."""
+  evaluator = PoseEvaluator(edm)
+  worlds, visible = evaluator.evaluate(arguments)
+  levels = lod_levels(edm)
+  vertex_cache = {}
+  corners, isShell = [], []
+  for node in iterate_renderables(edm, shells=shells):
+    if lod is not None and lod_level_of(node.parent, levels) not in (None, lod):
+      continue
+    index = evaluator.index.get(node.parent)
+    if index is not None and arguments is not None and not visible[index]:
+      continue
+    world = worlds[index] if index is not None else np.identity(4)
+    positions, _, _, indices = mesh_arrays(node, vertex_cache)
+    positions = positions.dot(world[:3, :3].T) + world[:3, 3]
+    corners.append(positions[indices.astype(np.int64).reshape(-1, 3)])
+    isShell.append(np.full(len(corners[-1]), isinstance(node, ShellNode), dtype=bool))
+  if not corners:
+    return np.zeros((0, 3, 3)), np.zeros(0, dtype=bool)
+  return np.concatenate(corners), np.concatenate(isShell)
+
+def rasterize(triangles, colours, size):
+  """Draws view-space triangles with a depth buffer.
+
+  triangles is (T,3,3) in pixel coordinates, with z towards the viewer, and
+  colours the (T,3) flat colour of each. Returns an (size,size,4) uint8 RGBA
+  image, transparent where nothing was drawn"""
+  depth = np.full(size * size, -np.inf)
+  image = np.zeros((size * size, 3))
+
+  # Drop triangles seen edge-on, and any entirely outside the image
+  a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+  area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])
+  low = np.clip(np.floor(triangles[:, :, :2].min(axis=1)).astype(np.int64), 0, size - 1)
+  high = np.clip(np.ceil(triangles[:, :, :2].max(axis=1)).astype(np.int64), 0, size - 1)
+  keep = (np.abs(area) > 1e-12) & (high >= low).all(axis=1)
+  triangles, colours, area, low, high = triangles[keep], colours[keep], area[keep], low[keep], high[keep]
+  extent = high - low + 1
+  counts = extent[:, 0] * extent[:, 1]
+
+  # Batches of triangles, limited by the number of candidate pixels
+  start = 0
+  while start < len(triangles):
+    total = np.cumsum(counts[start:])
+    end = start + max(1, int(np.searchsorted(total, _BATCH_PIXELS, side="right")))
+    _rasterize_batch(triangles[start:end], colours[start:end], area[start:end],
+                     low[start:end], extent[start:end], counts[start:end],
+                     size, depth, image)
+    start = end
+
+  alpha = np.isfinite(depth)
+  rgba = np.zeros((size * size, 4), dtype=np.uint8)
+  rgba[:, :3] = np.clip(image * 255 + 0.5, 0, 255).astype(np.uint8)
+  rgba[:, 3] = alpha * 255
+  # Rows run top to bottom in the image, but y is up in view space
+  return rgba.reshape(size, size, 4)[::-1]
+
+def _rasterize_batch(triangles, colours, area, low, extent, counts, size, depth, image):
+  """Tests every pixel in the bounding box of each triangle, and writes the
+  nearest covered ones into the depth and image buffers"""
+  owner = np.repeat(np.arange(len(triangles)), counts)
+  # Offset of each candidate within its triangle's bounding box
+  offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+  width = extent[owner, 0]
+  px = low[owner, 0] + offset % width
+  py = low[owner, 1] + offset // width
+  x, y = px + 0.5, py + 0.5
+
+  # Barycentric weights of the pixel centres
+  a, b, c = triangles[owner, 0], triangles[owner, 1], triangles[owner, 2]
+  w0 = ((b[:, 0] - x) * (c[:, 1] - y) - (c[:, 0] - x) * (b[:, 1] - y)) / area[owner]
+  w1 = ((c[:, 0] - x) * (a[:, 1] - y) - (a[:, 0] - x) * (c[:, 1] - y)) / area[owner]
+  w2 = 1.0 - w0 - w1
+  inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+  z = (w0 * a[:, 2] + w1 * b[:, 2] + w2 * c[:, 2])[inside]
+  pixel = (py * size + px)[inside]
+  owner = owner[inside]
+
+  # Nearest candidate wins; ties go to whichever is written last
+  np.maximum.at(depth, pixel, z)
+  nearest = z >= depth[pixel]
+  image[pixel[nearest]] = colours[owner[nearest]]
+
+def render_edm(edm, size=256, lod=0, shells=False, arguments=None,
+               azimuth=45.0, elevation=30.0, margin=0.05):
+  """Renders a flat-shaded orthographic preview of a parsed EDMFile.
+
+  The model is scaled to fill the image, leaving margin (as a fraction of the
+  size) free around it. See collect_triangles for lod, shells and arguments.
+  Returns a (size,size,4) uint8 RGBA array"""
+  corners, isShell = collect_triangles(edm, lod=lod, shells=shells, arguments=arguments)
+  if not len(corners):
+    return np.zeros((size, size, 4), dtype=np.uint8)
+
+  view = corners.dot(view_matrix(azimuth, elevation).T)
+
+  # Flat shading from the face normal, lit from either side
+  normals = np.cross(view[:, 1] - view[:, 0], view[:, 2] - view[:, 0])
+  lengths = np.linalg.norm(normals, axis=1)
+  normals /= np.where(lengths > 0, lengths, 1.0)[:, np.newaxis]
+  light = _AMBIENT + (1 - _AMBIENT) * np.abs(normals.dot(_LIGHT))
+  colours = np.where(isShell[:, np.newaxis], _SHELL_COLOUR, _MESH_COLOUR) * light[:, np.newaxis]
+
+  # Fit the projected bounds into the image
+  points = view.reshape(-1, 3)
+  lower, upper = points.min(axis=0), points.max(axis=0)
+  centre = (lower + upper) / 2
+  span = max((upper - lower)[:2].max(), 1e-6)
+  scale = size * (1 - 2 * margin) / span
+  pixels = (view - centre) * scale
+  pixels[:, :, :2] += size / 2.0
+  return rasterize(pixels, colours, size)
+
+def write_png(filename, image):
+  """Writes an (H,W,4) uint8 RGBA array as a PNG file"""
+  height, width = image.shape[:2]
+  def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + \
+           struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+  # Every scanline starts with a filter type byte, 0 for none
+  rows = np.column_stack([np.zeros(height, dtype=np.uint8),
+                          np.ascontiguousarray(image, dtype=np.uint8).reshape(height, -1)])
+  with open(filename, "wb") as f:
+    f.write(b"\x89PNG\r\n\x1a\n")
+    f.write(_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+    f.write(_chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+    f.write(_chunk(b"IEND", b""))
+
+def render_file(source, target, options={}):
+  """Renders the preview of one .edm file to a PNG. options are passed
+  through to render_edm"""
+  write_png(target, render_edm(EDMFile(source), **options))
+
+def _render_job(job, options):
+  """Worker entry point. Returns an error description, or None on success"""
+  source, target = job
+  try:
+    render_file(source, target, options)
+  except Exception:
+    return format_exc()
+  return None
+
+def render_files(jobs, options={}, processes=None):
+  """Renders a list of (source, target) filename pairs with a worker pool.
+  Returns a list of (source, error) for every render that failed."""
+  results = parallel_map(partial(_render_job, options=options), jobs, processes)
+  return [(job[0], error) for job, error in zip(jobs, results) if error]
@@ -0,0 +1,108 @@
+"""
+timing
+
+Simple wall-clock timing of the named phases of an operation, e.g. the
+parse, material creation and object building steps of an import, with
+optional cProfile dumps of each phase.
+
+  timer = PhaseTimer("import")
+  with timer.phase("parse") as phase:
+    edm = EDMFile(filename)
+    phase["objects"] = len(edm.nodes)
+  print(timer.report())
+  timer.write_json(filename + ".timing.json")
+"""
+
+import cProfile
+import json
+import os
+import platform
+import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class PhaseTimer(object):
+  def __init__(self, operation, filename=None, profile_dir=None, version=None):
+    """operation: Name of the operation being timed, e.g. "import"
+    filename:    The file being read or written, recorded in the results
+    profile_dir: If given, every phase is run under cProfile, and the stats
+                 dumped into this directory as <file>.<operation>.<phase>.prof,
+                 or edm_<operation>.<phase>.prof when timing several files.
+                 Phases run once per file add that file's name, taken from
+                 their "file" entry, and repeated names are numbered
+    version:     Version of the add-on, recorded in the results"""
+    self.operation = operation
+    self.filename = filename
+    self.profile_dir = profile_dir
+    self.version = version
+    self.phases = []
+    self._dumpNames = set()
+    self._start = time.perf_counter()
+
+  @contextmanager
+  def phase(self, name):
+    """Times the enclosed block as a named phase. Yields a dictionary that
+    object counts, or any other values, can be recorded in"""
+    record = OrderedDict([("name", name), ("seconds", 0.0)])
+    profiler = cProfile.Profile() if self.profile_dir else None
+    start = time.perf_counter()
+    if profiler:
+      profiler.enable()
+    try:
+      yield record
+    finally:
+      if profiler:
+        profiler.disable()
+      record["seconds"] = time.perf_counter() - start
+      self.phases.append(record)
+      if profiler:
+        self._dump_profile(profiler, record)
+
+  def _dump_profile(self, profiler, record):
+    if not os.path.isdir(self.profile_dir):
+      os.makedirs(self.profile_dir)
+    if isinstance(self.filename, (list, tuple)):
+      base = "edm_{}".format(self.operation)
+    else:
+      base = "{}.{}".format(os.path.basename(self.filename or "") or "edm", self.operation)
+    parts = [base, record["name"]]
+    if "file" in record:
+      parts.append(str(record["file"]))
+    stem = ".".join(re.sub(r"[^\w.-]+", "_", x) for x in parts)
+    dumpName, count = stem, 1
+    while dumpName in self._dumpNames:
+      count += 1
+      dumpName = "{}.{}".format(stem, count)
+    self._dumpNames.add(dumpName)
+    profiler.dump_stats(os.path.join(self.profile_dir, dumpName + ".prof"))
+
+  @property
+  def total(self):
+    return time.perf_counter() - self._start
+
+  def as_dict(self):
+    return OrderedDict([
+      ("operation", self.operation),
+      ("file", self.filename),
+      ("version", ".".join(str(x) for x in self.version) if self.version else None),
+      ("python", platform.python_version()),
+      ("time", time.strftime("%Y-%m-%d %H:%M:%S")),
+      ("total_seconds", self.total),
+      ("phases", self.phases),
+    ])
+
+  def write_json(self, filename):
+    with open(filename, "w") as f:
+      json.dump(self.as_dict(), f, indent=2)
+
+  def report(self):
+    """Returns a table of the phase timings"""
+    width = max([len(x["name"]) for x in self.phases] + [5])
+    lines = ["{} phase timings{}:".format(self.operation.capitalize(),
+      " for {}".format(self.filename) if self.filename else "")]
+    for record in self.phases:
+      extra = ", ".join("{}={}".format(k, v) for k, v in record.items() if not k in ("name", "seconds"))
+      lines.append("  {:<{w}} {:8.3f}s  {}".format(record["name"], record["seconds"], extra, w=width))
+    lines.append("  {:<{w}} {:8.3f}s".format("total", self.total, w=width))
+    return "\n".join(lines)
@@ -9,10 +9,18 @@ from .basereader import BaseReader
 
 from .material_types import VertexFormat, Material, Texture
 from .propertiesset import PropertiesSet
+from .containers import OrderedSet
 
 from collections import namedtuple, OrderedDict, Counter
 import itertools
 import struct
+import time
+from array import array
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
 
 from .mathtypes import Vector, sequence_to_matrix, Matrix, Quaternion
 
@@ -44,18 +52,75 @@ def get_type_reader(name):
   _readfun = _tr_get_type_reader(name)
   def _reader(reader):
     reader.typecount[name] += 1
-    return _readfun(reader)
+    if reader.profile is None:
+      return _readfun(reader)
+    return reader.profile.measure(name, _readfun, reader)
   return _reader
 
+class ReadProfile(object):
+  """Accumulates the time taken and bytes covered by each named type read.
+
+  Total values include any types read nested inside, whereas self values
+  only count what was not accounted to a nested type."""
+  def __init__(self):
+    self.calls = Counter()
+    self.time = Counter()
+    self.selfTime = Counter()
+    self.bytes = Counter()
+    self.selfBytes = Counter()
+    # [child time, child bytes] for every type currently being read
+    self._stack = []
+
+  def measure(self, name, function, reader):
+    """Calls function(reader), recording it against the type name"""
+    startPos = reader.tell()
+    self._stack.append([0.0, 0])
+    start = time.perf_counter()
+    try:
+      return function(reader)
+    finally:
+      elapsed = time.perf_counter() - start
+      span = reader.tell() - startPos
+      childTime, childBytes = self._stack.pop()
+      if self._stack:
+        self._stack[-1][0] += elapsed
+        self._stack[-1][1] += span
+      self.calls[name] += 1
+      self.time[name] += elapsed
+      self.selfTime[name] += elapsed - childTime
+      self.bytes[name] += span
+      self.selfBytes[name] += span - childBytes
+
+  def report(self, limit=None):
+    """Returns a table of every type, sorted by self time"""
+    names = sorted(self.calls, key=lambda x: self.selfTime[x], reverse=True)[:limit]
+    width = max([len(x) for x in names] + [4])
+    lines = ["{:<{w}} {:>8} {:>9} {:>9} {:>11} {:>11}".format(
+      "Type", "Calls", "Total s", "Self s", "Bytes", "Self bytes", w=width)]
+    for name in names:
+      lines.append("{:<{w}} {:>8} {:>9.4f} {:>9.4f} {:>11} {:>11}".format(
+        name, self.calls[name], self.time[name], self.selfTime[name],
+        self.bytes[name], self.selfBytes[name], w=width))
+    return "\n".join(lines)
+
 class TrackingReader(BaseReader):
   def __init__(self, *args, **kwargs):
     self.typecount = Counter()
     self.autoTypeCount = Counter()
+    # Set to a ReadProfile to record per-type timings
+    self.profile = None
     super(TrackingReader, self).__init__(*args, **kwargs)
 
   def mark_type_read(self, name, amount=1):
     self.typecount[name] += amount
 
+  def profiled(self, name, function, *args):
+    """Calls function(self, *args), recording it in any active profile as
+    reading a type called name"""
+    if self.profile is None:
+      return function(self, *args)
+    return self.profile.measure(name, lambda reader: function(reader, *args), self)
+
   def read_named_type(self, selfOrNone=None):
     assert selfOrNone is None or selfOrNone is self
     typeName = self.read_string()
@@ -92,14 +157,23 @@ def _read_main_object_dictionary(stream):
   return objects
 
 class EDMFile(object):
-  def __init__(self, filename=None):
+  def __init__(self, filename=None, profile=False):
+    """Reads an .edm file, if a filename is given.
+
+    profile: If True, the time and bytes read for every named type are
+             recorded in self.profile, and printed once the file is loaded"""
+    self.profile = None
     if filename:
       reader = TrackingReader(filename)
+      if profile:
+        reader.profile = self.profile = ReadProfile()
       try:
         self._read(reader)
       except:
         print("ERROR at {}".format(reader.tell()))
         raise
+      if profile:
+        print("Read profile for {}:\n{}".format(filename, self.profile.report()))
     else:
       self.version = 8
       self.indexA = {}
@@ -215,10 +289,11 @@ class EDMFile(object):
     indexB = {k: v for k, v in _allIndex.items() if k in _all_IndexB}
 
     # Do the writing
-    writer.write(b'EDM')
-    writer.write_ushort(8)
-    _write_index(writer, indexA)
-    _write_index(writer, indexB)
+    with writer.attribute("__index"):
+      writer.write(b'EDM')
+      writer.write_ushort(8)
+      _write_index(writer, indexA)
+      _write_index(writer, indexB)
 
     # Write the Root node
     writer.write_named_type(self.root)
@@ -232,13 +307,14 @@ class EDMFile(object):
       writer.write_named_type(node)
 
     # Write the parent data for the nodes
-    writer.write_int(-1)
-    # Everything without a parent has 0 as it's parent
-    for node in self.nodes[1:]:
-      if node.parent:
-        writer.write_uint(node.parent.index)
-      else:
-        writer.write_uint(0)
+    with writer.attribute("__parents"):
+      writer.write_int(-1)
+      # Everything without a parent has 0 as it's parent
+      for node in self.nodes[1:]:
+        if node.parent:
+          writer.write_uint(node.parent.index)
+        else:
+          writer.write_uint(0)
 
     # Now do the render objects dictionary
     objects = {}
@@ -260,7 +336,9 @@ class EDMFile(object):
 class GraphNode(object):
   def __init__(self):
     self.parent = None
-    self.children = []
+    # Ordered, so children are written in the order they were added, but with
+    # constant-time membership and removal for re-parenting
+    self.children = OrderedSet()
 
   def set_parent(self, parent):
     if self.parent is parent:
@@ -328,7 +406,7 @@ class RootNode(BaseNode):
     self.boundingBoxMin = stream.read_vec3d()
     self.boundingBoxMax = stream.read_vec3d()
     self.unknownB = [stream.read_vec3d() for _ in range(4)]
-    self.materials = stream.read_list(Material.read)
+    self.materials = stream.read_list(lambda x: x.profiled("model::Material", Material.read))
     stream.materials = self.materials
     self.unknownD = stream.read_uints(2)
     return self
@@ -357,7 +435,8 @@ class RootNode(BaseNode):
 
     writer.write_uint(len(self.materials))
     for mat in self.materials:
-      mat.write(writer)
+      with writer.attribute("model::Material", owner=mat):
+        mat.write(writer)
     writer.write_uint(0)
     writer.write_uint(0)
 
@@ -450,17 +529,25 @@ class ArgAnimationNode(Node, AnimatingNode):
     for arg, keyframes in self.posData:
       stream.write_uint(arg)
       stream.write_uint(len(keyframes))
-      for frame in keyframes:
-        stream.write_double(frame.frame)
-        stream.write_vec3d(frame.value)
+      with stream.attribute("model::Key<key::POSITION>", count=len(keyframes)):
+        if isinstance(keyframes, KeyTrack):
+          keyframes.write(stream)
+        else:
+          for frame in keyframes:
+            stream.write_double(frame.frame)
+            stream.write_vec3d(frame.value)
 
     stream.write_uint(len(self.rotData))
     for arg, keyframes in self.rotData:
       stream.write_uint(arg)
       stream.write_uint(len(keyframes))
-      for frame in keyframes:
-        stream.write_double(frame.frame)
-        stream.write_quaternion(frame.value)
+      with stream.attribute("model::Key<key::ROTATION>", count=len(keyframes)):
+        if isinstance(keyframes, KeyTrack):
+          keyframes.write(stream)
+        else:
+          for frame in keyframes:
+            stream.write_double(frame.frame)
+            stream.write_quaternion(frame.value)
 
     stream.write_uint(len(self.scaleData))
     assert not self.scaleData, "Not implemented"
@@ -511,7 +598,8 @@ class ArgRotationNode(ArgAnimationNode):
     stream.mark_type_read("model::ArgAnimationNode::Rotation")
     arg = stream.read_uint()
     count = stream.read_uint()
-    keys = [get_type_reader("model::Key<key::ROTATION>")(stream) for _ in range(count)]
+    stream.mark_type_read("model::Key<key::ROTATION>", count)
+    keys = stream.profiled("model::Key<key::ROTATION>", KeyTrack.read, RotationKey, 4, count)
     return (arg, keys)
 
 @reads_type("model::ArgPositionNode")
@@ -528,7 +616,8 @@ class ArgPositionNode(ArgAnimationNode):
     stream.mark_type_read("model::ArgAnimationNode::Position")
     arg = stream.read_uint()
     count = stream.read_uint()
-    keys = [get_type_reader("model::Key<key::POSITION>")(stream) for _ in range(count)]
+    stream.mark_type_read("model::Key<key::POSITION>", count)
+    keys = stream.profiled("model::Key<key::POSITION>", KeyTrack.read, PositionKey, 3, count)
     return (arg, keys)
 
 @reads_type("model::ArgScaleNode")
@@ -545,16 +634,20 @@ class ArgScaleNode(ArgAnimationNode):
     count = stream.read_uint()
     # Weirdly seems to be two sets of keys; one with 4-components and one with three
     # keys = [get_type_reader("model::Key<key::SCALE>")(stream) for _ in range(count)]
-    keys = [ScaleKey.read(stream, 4) for _ in range(count)]
+    keys = KeyTrack.read(stream, ScaleKey, 4, count)
     count2 = stream.read_uint()
     # Second set of keys only has three components...?
-    key2s = [ScaleKey.read(stream, 3) for _ in range(count2)]
+    key2s = KeyTrack.read(stream, ScaleKey, 3, count2)
     # print("Edn of scale arg at ", steam.tell())
     return (arg, (keys, key2s))
 
 
 @reads_type("model::Key<key::ROTATION>")
 class RotationKey(object):
+  __slots__ = ("frame", "value")
+  valueType = Quaternion
+  # Held as wxyz but stored on disk as xyzw; the file position of each component
+  fileOrder = (3, 0, 1, 2)
   def __init__(self, frame=None, value=None):
     self.frame = frame
     self.value = value
@@ -570,6 +663,9 @@ class RotationKey(object):
 
 @reads_type("model::Key<key::POSITION>")
 class PositionKey(object):
+  __slots__ = ("frame", "value")
+  valueType = Vector
+  fileOrder = None
   def __init__(self, frame=None, value=None):
     self.frame = frame
     self.value = value
@@ -584,6 +680,12 @@ class PositionKey(object):
 
 @reads_type("model::Key<key::SCALE>")
 class ScaleKey(object):
+  __slots__ = ("frame", "value")
+  valueType = Vector
+  fileOrder = None
+  def __init__(self, frame=None, value=None):
+    self.frame = frame
+    self.value = value
   @classmethod
   def read(cls, stream, entrylength):
     self = cls()
@@ -593,6 +695,133 @@ class ScaleKey(object):
   def __repr__(self):
     return "Key(frame={}, value={})".format(self.frame, repr(self.value))
 
+class KeyTrack(object):
+  """The keyframes for one animation argument, held as flat arrays of frames
+  and values instead of as an object per key.
+
+  Behaves as a sequence of keyClass objects (e.g. PositionKey), which are
+  created on access, so can be used anywhere a list of keys is expected.
+  values holds width doubles per key, in the same order as key.value."""
+  __slots__ = ("keyClass", "width", "frames", "values")
+
+  def __init__(self, keyClass, width, frames=(), values=()):
+    self.keyClass = keyClass
+    self.width = width
+    self.frames = array("d", frames)
+    self.values = array("d", values)
+    assert len(self.values) == width * len(self.frames), "Key values do not match frame count"
+
+  @classmethod
+  def from_keys(cls, keyClass, width, keys):
+    """Creates a track from a sequence of key objects"""
+    keys = list(keys)
+    return cls(keyClass, width, [x.frame for x in keys],
+               itertools.chain.from_iterable(x.value for x in keys))
+
+  @classmethod
+  def from_arrays(cls, keyClass, frames, values):
+    """Creates a track from NumPy (K,) frames and (K, width) values arrays"""
+    values = numpy.asarray(values, dtype="=f8")
+    self = cls(keyClass, values.shape[1] if values.ndim == 2 else 0)
+    self.frames.frombytes(numpy.ascontiguousarray(frames, dtype="=f8").tobytes())
+    self.values.frombytes(numpy.ascontiguousarray(values).tobytes())
+    return self
+
+  @classmethod
+  def read(cls, stream, keyClass, width, count):
+    """Reads count keys, each a double frame followed by width doubles"""
+    if numpy is not None:
+      return cls._read_numpy(stream, keyClass, width, count)
+    stride = width + 1
+    try:
+      data = stream.read_doubles(count * stride)
+    except struct.error:
+      raise IOError("Unexpected end of file reading {} keys of {} bytes".format(count, 8 * stride))
+    values = [data[i::stride] for i in range(1, stride)]
+    if keyClass.fileOrder:
+      values = [values[i] for i in keyClass.fileOrder]
+    return cls(keyClass, width, data[0::stride], itertools.chain.from_iterable(zip(*values)))
+
+  @classmethod
+  def _read_numpy(cls, stream, keyClass, width, count):
+    """Decodes the whole block of keys at once with a structured dtype"""
+    dtype = numpy.dtype([("frame", "<f8"), ("value", "<f8", (width,))])
+    data = stream.read(count * dtype.itemsize)
+    if len(data) != count * dtype.itemsize:
+      raise IOError("Unexpected end of file reading {} keys of {} bytes".format(count, dtype.itemsize))
+    records = numpy.frombuffer(data, dtype=dtype)
+    values = records["value"]
+    if keyClass.fileOrder:
+      values = values[:, keyClass.fileOrder]
+    self = cls(keyClass, width)
+    self.frames.frombytes(records["frame"].astype("=f8").tobytes())
+    self.values.frombytes(numpy.ascontiguousarray(values, dtype="=f8").tobytes())
+    return self
+
+  def as_arrays(self):
+    """Returns NumPy views of the (K,) frames and (K, width) values.
+
+    The views share memory with the track, so while any of them exist the
+    track cannot be resized, and append raises BufferError. Use key_arrays
+    for copies that can be kept."""
+    frames = numpy.frombuffer(self.frames, dtype="=f8") if self.frames else numpy.zeros(0)
+    values = numpy.frombuffer(self.values, dtype="=f8") if self.values else numpy.zeros(0)
+    return frames, values.reshape(-1, self.width)
+
+  def write(self, stream):
+    """Writes the keys, as they would be read by read"""
+    if numpy is not None:
+      frames, values = self.as_arrays()
+      if self.keyClass.fileOrder:
+        values = values[:, [self.keyClass.fileOrder.index(i) for i in range(self.width)]]
+      stream.write(numpy.column_stack([frames, values]).astype("<f8").tobytes())
+      return
+    width = self.width
+    values = [self.values[i::width] for i in range(width)]
+    if self.keyClass.fileOrder:
+      values = [values[self.keyClass.fileOrder.index(i)] for i in range(width)]
+    stream.write_doubles(list(itertools.chain.from_iterable(zip(self.frames, *values))))
+
+  def __len__(self):
+    return len(self.frames)
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [self[i] for i in range(*index.indices(len(self)))]
+    if index < 0:
+      index += len(self)
+    if not 0 <= index < len(self):
+      raise IndexError("KeyTrack index out of range")
+    start = index * self.width
+    return self.keyClass(frame=self.frames[index],
+      value=self.keyClass.valueType(self.values[start:start+self.width]))
+
+  def __iter__(self):
+    valueType, keyClass, width, values = self.keyClass.valueType, self.keyClass, self.width, self.values
+    for i, frame in enumerate(self.frames):
+      yield keyClass(frame=frame, value=valueType(values[i*width:(i+1)*width]))
+
+  def append(self, key):
+    """Adds a key to the end. Raises BufferError while views from as_arrays
+    are still alive"""
+    self.frames.append(key.frame)
+    self.values.extend(key.value)
+
+  def __repr__(self):
+    return "KeyTrack({}, {} keys)".format(self.keyClass.__name__, len(self))
+
+def key_arrays(keys, width):
+  """Returns NumPy (K,) frames and (K, width) values arrays for a KeyTrack,
+  or for any other sequence of key objects. These are always copies, so
+  holding them does not stop the track from being appended to"""
+  if isinstance(keys, KeyTrack):
+    frames, values = keys.as_arrays()
+    return frames.copy(), values.copy()
+  keys = list(keys)
+  frames = numpy.array([x.frame for x in keys], dtype=float)
+  values = numpy.array([list(x.value) for x in keys], dtype=float).reshape(-1, width)
+  return frames, values
+
 @reads_type("model::ArgVisibilityNode")
 class ArgVisibilityNode(Node, AnimatingNode):
   @classmethod
@@ -606,7 +835,7 @@ class ArgVisibilityNode(Node, AnimatingNode):
     stream.mark_type_read("model::ArgVisibilityNode::Arg")
     arg = stream.read_uint()
     count = stream.read_uint()
-    data = [stream.read_doubles(2) for _ in range(count)]
+    data = stream.read_records("<2d", count)
     stream.mark_type_read("model::ArgVisibilityNode::Range", count)
     return (arg, data)
 
@@ -622,7 +851,7 @@ class LodNode(Node):
   def read(cls, stream):
     self = super(LodNode, cls).read(stream)
     count = stream.read_uint()
-    self.level = [tuple(math.sqrt(x) for x in stream.read_doubles(2)) for x in range(count)]
+    self.level = [(math.sqrt(low), math.sqrt(high)) for low, high in stream.read_records("<2d", count)]
     stream.mark_type_read("model::LodNode::Level", count)
     return self
   def audit(self):
@@ -684,19 +913,23 @@ def _write_index_data(indexData, vertexDataLength, writer):
   # Index data
   if vertexDataLength < 256:
     writer.write_uchar(0)
-    iWriter = writer.write_uchars
+    iWriter, dtype = writer.write_uchars, "<u1"
   elif vertexDataLength < 2**16:
     writer.write_uchar(1)
-    iWriter = writer.write_ushorts
+    iWriter, dtype = writer.write_ushorts, "<u2"
   elif vertexDataLength < 2**32:
     writer.write_uchar(2)
-    iWriter = writer.write_uints
+    iWriter, dtype = writer.write_uints, "<u4"
   else:
     raise IOError("Do not know how to write index arrays with {} members".format(vertexDataLength))
 
   writer.write_uint(len(indexData))
   writer.write_uint(5)
-  iWriter(indexData)
+  if hasattr(indexData, "astype"):
+    # Array data can be written in one block
+    writer.write(indexData.astype(dtype).tobytes())
+  else:
+    iWriter(indexData)
 
 def _read_vertex_data(stream, classification=None):
   count = stream.read_uint()
@@ -714,8 +947,12 @@ def _read_vertex_data(stream, classification=None):
 def _write_vertex_data(data, writer):
   writer.write_uint(len(data))
   writer.write_uint(len(data[0]))
-  flat_data = list(itertools.chain(*data))
-  writer.write_floats(flat_data)
+  if hasattr(data, "astype"):
+    # Array data can be written in one block
+    writer.write(data.astype("<f4").tobytes())
+  else:
+    flat_data = list(itertools.chain(*data))
+    writer.write_floats(flat_data)
 
 def _read_parent_data(stream):
     # Read the parent section
@@ -753,7 +990,7 @@ class RenderNode(BaseNode):
   def __init__(self, name=None):
     super(RenderNode, self).__init__(name)
     self.version = 1
-    self.children = []
+    self.children = OrderedSet()
     self.unknown_start = 0
     self.material = None
     self.parentData = None
@@ -776,8 +1013,8 @@ class RenderNode(BaseNode):
     self.parentData = _read_parent_data(stream)
 
     # Read the vertex and index data
-    self.vertexData = _read_vertex_data(stream, "__gv_bytes")
-    self.unknown_indexPrefix, self.indexData = _read_index_data(stream, classification="__gi_bytes")
+    self.vertexData = stream.profiled("__gv_bytes", _read_vertex_data, "__gv_bytes")
+    self.unknown_indexPrefix, self.indexData = stream.profiled("__gi_bytes", _read_index_data, "__gi_bytes")
 
     return self
 
@@ -788,13 +1025,23 @@ class RenderNode(BaseNode):
       self.material = self.material.index
     writer.write_uint(self.material)
 
-    # Rebuild the parentdata
-    writer.write_uint(1)
-    writer.write_uint(self.parent.index)
-    writer.write_int(-1)
+    # Rebuild the parentdata. Several parents means a split node, with one
+    # (parent, index range end, damage argument) entry for each part
+    if self.parentData and len(self.parentData) > 1:
+      writer.write_uint(len(self.parentData))
+      for parent, idxTo, damageArg in self.parentData:
+        writer.write_uint(parent.index)
+        writer.write_int(idxTo)
+        writer.write_int(damageArg)
+    else:
+      writer.write_uint(1)
+      writer.write_uint(self.parent.index)
+      writer.write_int(getattr(self, "damage_argument", -1))
 
-    _write_vertex_data(self.vertexData, writer)
-    _write_index_data(self.indexData, len(self.vertexData), writer)
+    with writer.attribute("__gv_bytes"):
+      _write_vertex_data(self.vertexData, writer)
+    with writer.attribute("__gi_bytes"):
+      _write_index_data(self.indexData, len(self.vertexData), writer)
 
   def audit(self):
     c = _render_audit(self)
@@ -851,8 +1098,8 @@ class ShellNode(BaseNode):
     self.vertex_format = VertexFormat.read(stream)
 
     # Read the vertex and index data
-    self.vertexData = _read_vertex_data(stream, "__cv_bytes")
-    self.unknown_indexPrefix, self.indexData = _read_index_data(stream, classification="__ci_bytes")
+    self.vertexData = stream.profiled("__cv_bytes", _read_vertex_data, "__cv_bytes")
+    self.unknown_indexPrefix, self.indexData = stream.profiled("__ci_bytes", _read_index_data, "__ci_bytes")
 
     return self
   
@@ -863,8 +1110,10 @@ class ShellNode(BaseNode):
     super(ShellNode, self).write(writer)
     writer.write_uint(self.parent.index)
     self.vertex_format.write(writer)
-    _write_vertex_data(self.vertexData, writer)
-    _write_index_data(self.indexData, len(self.vertexData), writer)
+    with writer.attribute("__cv_bytes"):
+      _write_vertex_data(self.vertexData, writer)
+    with writer.attribute("__ci_bytes"):
+      _write_index_data(self.indexData, len(self.vertexData), writer)
 
   
 @reads_type("model::SkinNode")
@@ -881,8 +1130,8 @@ class SkinNode(BaseNode):
     self.post_bone = stream.read_uint()
 
     # Read the vertex and index data
-    self.vertexData = _read_vertex_data(stream, "__gv_bytes")
-    self.unknown_indexPrefix, self.indexData = _read_index_data(stream, classification="__gi_bytes")
+    self.vertexData = stream.profiled("__gv_bytes", _read_vertex_data, "__gv_bytes")
+    self.unknown_indexPrefix, self.indexData = stream.profiled("__gi_bytes", _read_index_data, "__gi_bytes")
 
     return self
 
@@ -900,7 +1149,7 @@ class SegmentsNode(BaseNode):
     self = super(SegmentsNode, cls).read(stream)
     self.unknown = stream.read_uint()
     count = stream.read_uint()
-    self.data = [stream.read_floats(6) for x in range(count)]
+    self.data = stream.read_records("<6f", count)
     stream.mark_type_read("model::SegmentsNode::Segments", count)
     return self
 
@@ -943,19 +1192,13 @@ class FakeSpotLightsNode(BaseNode):
     # We have parent-like blocks of two uints + three floats
     controlNodeCount = stream.read_uint()
 
-    self.parentData = []
-    for _ in range(controlNodeCount):
-      self.parentData.append([
-          stream.read_uint(),
-          stream.read_uint(),
-          stream.read_floats(3)
-        ])
+    self.parentData = [[a, b, (x, y, z)] for a, b, x, y, z in stream.read_records("<II3f", controlNodeCount)]
     # Control node seems to follow same rules as RenderNode
     if controlNodeCount:
       stream.mark_type_read('model::FSLNControlNode', controlNodeCount-1)
 
     dataCount = stream.read_uint()
-    self.data = [stream.read(65) for _ in range(dataCount)]
+    self.data = [x for (x,) in stream.read_records("65s", dataCount)]
     stream.mark_type_read("model::FakeSpotLight", dataCount)
 
     # print(dataCount)
@@ -972,7 +1215,7 @@ class FakeOmniLightsNode(BaseNode):
     self = super(FakeOmniLightsNode, cls).read(stream)
     self.data_start = stream.read_uints(5)
     count = stream.read_uint()
-    self.data = [stream.read_doubles(6) for _ in range(count)]
+    self.data = stream.read_records("<6d", count)
     stream.mark_type_read("model::FakeOmniLight", count)
     return self
   def prepare(self, nodes, materials):
@@ -987,7 +1230,7 @@ class FakeALSNode(BaseNode):
     # batumi.edm 1138915 x 340
     stream.read_uints(3)
     count = stream.read_uint()
-    self.data = [stream.read(80) for _ in range(count)]
+    self.data = [x for (x,) in stream.read_records("80s", count)]
     stream.mark_type_read("model::FakeALSLight", count)
     return self
 
@@ -12,7 +12,7 @@ import os
 import logging
 logger = logging.getLogger(__name__)
 
-from .reader import read_file
+from .reader import read_files
 from .writer import write_file
 
 class ImportEDM(Operator, ImportHelper):
@@ -36,20 +36,28 @@ class ImportEDM(Operator, ImportHelper):
       description="Import materials as shadeless (no lights required in blender)",
       default=False)
 
+  timing = BoolProperty(name="Write Timings",
+      description="Write the time taken by each import step to a .timing.json file",
+      default=False)
+
+  profile = BoolProperty(name="Profile",
+      description="Profile each import step, and save the stats as .prof files",
+      default=False)
+
   def execute(self, context):
     # Get a list of files
     paths = [os.path.join(self.directory, name.name) for name in self.files]
     if not paths:
       paths.append(self.filepath)
 
-    if len(paths) > 1:
-      self.report("ERROR", "Importer cannot handle more than one input file currently")
-      return "CANCELLED"
-    
-    # Import the file
-    logger.warning("Reading EDM file {}".format(paths[0]))
+    # Import the files
+    logger.warning("Reading EDM files {}".format(", ".join(paths)))
     
-    read_file(paths[0], options={"shadeless": self.shadeless})
+    read_files(paths, options={
+      "shadeless": self.shadeless,
+      "timing": self.timing,
+      "profile": self.profile,
+    })
     return {'FINISHED'}
 
 
@@ -69,6 +77,34 @@ class ExportEDM(Operator, ExportHelper):
       description="Should object modifiers be applied before export?",
       default=True)
 
+    size_report = BoolProperty(name="Size Report",
+      description="Print a breakdown of the file size by type and object",
+      default=False)
+
+    dry_run = BoolProperty(name="Only Report Size",
+      description="Do not write the file, only print the size breakdown it would have",
+      default=False)
+
+    reduce_keys = BoolProperty(name="Reduce Animation Keys",
+      description="Remove animation keys that interpolating between the remaining keys recreates, within the tolerances",
+      default=False)
+
+    key_position_tolerance = FloatProperty(name="Position Tolerance",
+      description="Furthest a removed position key may be from the interpolated position",
+      default=0.0001, min=0.0, precision=5)
+
+    key_angle_tolerance = FloatProperty(name="Angle Tolerance",
+      description="Largest angle a removed rotation key may be from the interpolated rotation",
+      default=0.0001, min=0.0, subtype='ANGLE', precision=4)
+
+    timing = BoolProperty(name="Write Timings",
+      description="Write the time taken by each export step to a .timing.json file",
+      default=False)
+
+    profile = BoolProperty(name="Profile",
+      description="Profile each export step, and save the stats as .prof files",
+      default=False)
+
     # type = EnumProperty(
     #         name="Example Enum",
     #         description="Choose between two items",
@@ -78,7 +114,16 @@ class ExportEDM(Operator, ExportHelper):
     #         )
 
     def execute(self, context):
-        write_file(self.filepath, options={"apply_modifiers": self.apply_modifiers})
+        write_file(self.filepath, options={
+          "apply_modifiers": self.apply_modifiers,
+          "size_report": self.size_report,
+          "dry_run": self.dry_run,
+          "reduce_keys": self.reduce_keys,
+          "key_position_tolerance": self.key_position_tolerance,
+          "key_angle_tolerance": self.key_angle_tolerance,
+          "timing": self.timing,
+          "profile": self.profile,
+        })
         return {'FINISHED'}
 
 
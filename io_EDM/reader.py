@@ -7,8 +7,9 @@ Contains the central EDM->Blender conversion code
 import bpy
 import bmesh
 
-from .utils import chdir, print_edm_graph
+from .utils import chdir, print_edm_graph, create_phase_timer, finish_phase_timer, KEYFRAME_INTERPOLATION
 from .edm import EDMFile
+from .edm.parallel import parse_files
 from .edm.mathtypes import *
 from .edm.types import *
 
@@ -20,6 +21,8 @@ import fnmatch
 import os
 import itertools
 
+import numpy as np
+
 FRAME_SCALE = 100
 
 def iterate_renderNodes(edmFile):
@@ -106,8 +109,9 @@ def build_graph(edmFile):
   return graph
 
 
-def process_node(node):
-  """Processes a single node of the transform graph"""
+def process_node(node, cache=None):
+  """Processes a single node of the transform graph. Animation actions are
+  shared through the ImportCache, if given"""
   # Root node has no processing
   if node.parent is None:
     return
@@ -149,7 +153,7 @@ def process_node(node):
   if node.transform:
     # Now, apply the animation, if there is one
     if isinstance(node.transform, AnimatingNode):
-      actions = get_actions_for_node(node.transform)
+      actions = get_actions_for_node(node.transform, cache)
       if len(actions) > 1:
         print("Warning: More than one action for node not yet integrated")
       if actions:
@@ -178,9 +182,51 @@ def process_node(node):
       child.blender.edm.lod_max_distance = end
       child.blender.edm.nouse_lod_distance = end > 1e6
 
-def read_file(filename, options={}):
+class ImportCache(object):
+  """Holds blender data that can be shared between several imported files,
+  so that common materials, textures and animation actions are only created
+  once"""
+  def __init__(self):
+    self.materials = {}
+    self.textures = {}
+    self.actions = {}
+
+def read_file(filename, options={}, cache=None):
+  timer = create_phase_timer("import", [filename], options)
   # Parse the EDM file
-  edm = EDMFile(filename)
+  with timer.phase("parse") as phase:
+    edm = EDMFile(filename)
+    phase["nodes"] = len(edm.nodes)
+    phase["renderNodes"] = len(edm.renderNodes)
+  import_edm(edm, filename, options, cache, timer)
+  finish_phase_timer(timer, options)
+
+def read_files(filenames, options={}):
+  """Imports several .edm files in one operation.
+
+  The files are parsed in parallel worker processes, and then the blender
+  data for each is built in turn, sharing materials and textures between
+  all of the files."""
+  timer = create_phase_timer("import", filenames, options)
+  with timer.phase("parse") as phase:
+    # Workers must be started as python processes, not as copies of blender
+    edms = parse_files(filenames, executable=bpy.app.binary_path_python or None)
+    phase["files"] = len(edms)
+    phase["nodes"] = sum(len(x.nodes) for x in edms)
+    phase["renderNodes"] = sum(len(x.renderNodes) for x in edms)
+
+  cache = ImportCache()
+  for filename, edm in zip(filenames, edms):
+    import_edm(edm, filename, options, cache, timer)
+  finish_phase_timer(timer, options)
+
+def import_edm(edm, filename, options={}, cache=None, timer=None):
+  """Builds the blender data for an already-parsed EDMFile. If a PhaseTimer
+  is passed, the time spent in each step is recorded in it"""
+  if cache is None:
+    cache = ImportCache()
+  if timer is None:
+    timer = create_phase_timer("import", [filename])
 
   print("Raw file graph:")
   print_edm_graph(edm.transformRoot)
@@ -194,101 +240,150 @@ def read_file(filename, options={}):
   # Convert the materials. These will be used by objects
   # We need to change the directory as the material searcher
   # currently uses the cwd
-  with chdir(os.path.dirname(os.path.abspath(filename))):
+  with timer.phase("materials") as phase, chdir(os.path.dirname(os.path.abspath(filename))):
+    phase["file"] = os.path.basename(filename)
+    phase["materials"] = len(edm.root.materials)
     for material in edm.root.materials:
-      material.blender_material = create_material(material)
+      material.blender_material = create_material(material, cache)
       if material.blender_material and options.get("shadeless", False):
         material.blender_material.use_shadeless = True
 
   # WIP - use a translation graph to read. For now, just use it to print 
   # the file structure
-  graph = build_graph(edm)
+  with timer.phase("build_graph") as phase:
+    phase["file"] = os.path.basename(filename)
+    graph = build_graph(edm)
+    phase["nodes"] = len(graph.nodes)
   graph.print_tree()
 
   # Walk through every node, and do the node processing
-  graph.walk_tree(process_node)
+  with timer.phase("process_node") as phase:
+    phase["file"] = os.path.basename(filename)
+    objectCount = len(bpy.data.objects)
+    actionCount = len(bpy.data.actions)
+    graph.walk_tree(lambda node: process_node(node, cache))
+    phase["objects"] = len(bpy.data.objects) - objectCount
+    phase["actions"] = len(bpy.data.actions) - actionCount
 
   # Update the scene
-  bpy.context.scene.update()
+  with timer.phase("scene_update"):
+    bpy.context.scene.update()
+
+def add_keyframes(curve, frames, values, interpolation):
+  """Appends keyframes to an fcurve in bulk.
 
-def create_visibility_actions(visNode):
+  frames and values are equal-length sequences, and every new key is given
+  the same interpolation mode. The keyframe data is written with one
+  foreach_set call per property instead of per key."""
+  count = len(frames)
+  if not count:
+    return
+  points = curve.keyframe_points
+  existing = len(points)
+  points.add(count)
+  co = np.zeros((existing + count, 2), dtype=np.float32)
+  if existing:
+    points.foreach_get("co", co.ravel())
+  co[existing:, 0] = frames
+  co[existing:, 1] = values
+  points.foreach_set("co", co.ravel())
+
+  modes = np.full(existing + count, KEYFRAME_INTERPOLATION[interpolation], dtype=np.int32)
+  try:
+    if existing:
+      points.foreach_get("interpolation", modes)
+      modes[existing:] = KEYFRAME_INTERPOLATION[interpolation]
+    points.foreach_set("interpolation", modes)
+  except (TypeError, RuntimeError):
+    # Not every blender version allows bulk access to enum properties
+    for index in range(existing, existing + count):
+      points[index].interpolation = interpolation
+  curve.update()
+
+def get_shared_action(name, argument, curves, cache=None):
+  """Gets an action holding a set of fcurves, creating it if needed.
+
+  curves is a list of (data_path, frames, values, interpolation), with one
+  fcurve made for every column of the (K, C) values array. If a cache is
+  given, an action created previously with exactly the same argument and
+  curve data is reused, so that e.g. a row of identical switches all share
+  a single action."""
+  if cache is not None:
+    key = (name, argument, tuple((path, interpolation, values.shape,
+                                  np.ascontiguousarray(frames, dtype=float).tobytes(),
+                                  np.ascontiguousarray(values, dtype=float).tobytes())
+                                 for path, frames, values, interpolation in curves))
+    if key in cache.actions:
+      return cache.actions[key]
+
+  action = bpy.data.actions.new(name)
+  action.argument = argument
+  for path, frames, values, interpolation in curves:
+    for i in range(values.shape[1]):
+      curve = action.fcurves.new(data_path=path, index=i)
+      add_keyframes(curve, frames, values[:, i], interpolation)
+
+  if cache is not None:
+    cache.actions[key] = action
+  return action
+
+def visibility_fcurve_keys(ranges):
+  """Converts the visibility ranges of an argument to the frames and (K,1)
+  values of a hide_render fcurve"""
+  frames, values = [], []
+  # Probably need an extra keyframe to specify start visibility
+  if ranges[0][0] >= -0.995:
+    frames.append(-FRAME_SCALE)
+    values.append(1.0)
+  # Create the keyframe data
+  for (start, end) in ranges:
+    frameStart = int(start*FRAME_SCALE)
+    frameEnd = FRAME_SCALE if end > 1.0 else int(end*FRAME_SCALE)
+    frames.append(frameStart)
+    values.append(0.0)
+    if frameEnd < FRAME_SCALE:
+      frames.append(frameEnd)
+      values.append(1.0)
+  return np.array(frames, dtype=float), np.array(values, dtype=float).reshape(-1, 1)
+
+def create_visibility_actions(visNode, cache=None):
   """Creates visibility actions from an ArgVisibilityNode"""
   actions = []
   for (arg, ranges) in visNode.visData:
-    # Creates a visibility animation track
-    action = bpy.data.actions.new("Visibility_{}".format(arg))
-    actions.append(action)
-    action.argument = arg
-    # Create f-curves for hide_render
-    curve = action.fcurves.new(data_path="hide_render")
-    # Probably need an extra keyframe to specify start visibility
-    if ranges[0][0] >= -0.995:
-      curve.keyframe_points.add()
-      curve.keyframe_points[0].co = (-FRAME_SCALE, 1.0)
-      curve.keyframe_points[0].interpolation = 'CONSTANT'
-    # Create the keyframe data
-    for (start, end) in ranges:
-      frameStart = int(start*FRAME_SCALE)
-      frameEnd = FRAME_SCALE if end > 1.0 else int(end*FRAME_SCALE)
-      curve.keyframe_points.add()
-      key = curve.keyframe_points[-1]
-      key.co = (frameStart, 0.0)
-      key.interpolation = 'CONSTANT'
-      if frameEnd < FRAME_SCALE:
-        curve.keyframe_points.add()
-        key = curve.keyframe_points[-1]
-        key.co = (frameEnd, 1.0)
-        key.interpolation = 'CONSTANT'
+    # Creates a visibility animation track, with f-curves for hide_render
+    frames, values = visibility_fcurve_keys(ranges)
+    actions.append(get_shared_action("Visibility_{}".format(arg), arg,
+                                     [("hide_render", frames, values, 'CONSTANT')], cache))
   return actions
 
-def add_position_fcurves(action, keys, transform_left, transform_right):
-  "Adds position fcurve data to an animation action"
-  maxFrame = max(abs(x.frame) for x in keys) or 1.0
-  frameScale = float(FRAME_SCALE) / maxFrame
-  # Create an fcurve for every component  
-  curves = []
-  for i in range(3):
-    curve = action.fcurves.new(data_path="location", index=i)
-    curves.append(curve)
-
-  # Loop over every keyframe in this animation
-  for framedata in keys:
-    frame = int(frameScale*framedata.frame)
-    
-    # Calculate the rotation transformation
-    newPosMat = transform_left * Matrix.Translation(framedata.value) * transform_right
-    newPos = newPosMat.decompose()[0]
-
-    for curve, component in zip(curves, newPos):
-      curve.keyframe_points.add()
-      curve.keyframe_points[-1].co = (frame, component)
-      curve.keyframe_points[-1].interpolation = 'LINEAR'
-
-def add_rotation_fcurves(action, keys, transform_left, transform_right):
-  "Adds rotation fcurve action to an animation action"
-  maxFrame = max(abs(x.frame) for x in keys) or 1.0
-  frameScale = float(FRAME_SCALE) / maxFrame
-  
-  # Create an fcurve for every component  
-  curves = []
-  for i in range(4):
-    curve = action.fcurves.new(data_path="rotation_quaternion", index=i)
-    curves.append(curve)
-
-  # Loop over every keyframe in this animation
-  for framedata in keys:
-    frame = int(frameScale*framedata.frame)
-    
-    # Calculate the rotation transformation
-    newRot = transform_left * framedata.value * transform_right
-
-    for curve, component in zip(curves, newRot):
-      curve.keyframe_points.add()
-      curve.keyframe_points[-1].co = (frame, component)
-      curve.keyframe_points[-1].interpolation = 'LINEAR'
-
-def create_arganimation_actions(node):
-  "Creates a set of actions to represent an ArgAnimationNode"
+def position_fcurve_keys(keys, transform_left, transform_right):
+  """Converts position keys to the frames and (K,3) values of location
+  fcurves"""
+  frames, values = key_arrays(keys, 3)
+  maxFrame = np.abs(frames).max() if len(frames) else 0.0
+  frameScale = float(FRAME_SCALE) / (maxFrame or 1.0)
+
+  # Calculate the position transformation of every keyframe at once
+  frames = (frameScale * frames).astype(int)
+  positions = translation_products(transform_left, values, transform_right)
+  return frames, positions
+
+def rotation_fcurve_keys(keys, transform_left, transform_right):
+  """Converts rotation keys to the frames and (K,4) values of
+  rotation_quaternion fcurves"""
+  frames, values = key_arrays(keys, 4)
+  maxFrame = np.abs(frames).max() if len(frames) else 0.0
+  frameScale = float(FRAME_SCALE) / (maxFrame or 1.0)
+
+  # Calculate the rotation transformation of every keyframe at once
+  frames = (frameScale * frames).astype(int)
+  rotations = quaternions_multiply(quaternions_multiply(list(transform_left), values),
+                                   list(transform_right))
+  return frames, rotations
+
+def create_arganimation_actions(node, cache=None):
+  """Creates a set of actions to represent an ArgAnimationNode. If a cache is
+  given, identical actions are shared with other nodes"""
   actions = []
 
   # Calculate the base transform data for the node
@@ -344,10 +439,6 @@ def create_arganimation_actions(node):
     posData = [x[1] for x in node.posData if x[0] == arg]
     rotData = [x[1] for x in node.rotData if x[0] == arg]
     scaleData = [x[1] for x in node.scaleData if x[0] == arg]
-    # Create the action
-    action = bpy.data.actions.new("AnimationArg{}".format(arg))
-    actions.append(action)
-    action.argument = arg
     
     # Calculate the pre and post-animation-value transforms
     leftRotation = matQuat * q1
@@ -356,17 +447,22 @@ def create_arganimation_actions(node):
     leftPosition = matrix_to_blender(mat) * aabT
     rightPosition = aabS
 
-    # Build the f-curves for the action
+    # Build the f-curve data, and get (or create) the action holding it
+    curves = []
     for pos in posData:
-      add_position_fcurves(action, pos, leftPosition, rightPosition)
+      frames, values = position_fcurve_keys(pos, leftPosition, rightPosition)
+      curves.append(("location", frames, values, 'LINEAR'))
     for rot in rotData:
-      add_rotation_fcurves(action, rot, leftRotation, rightRotation)
+      frames, values = rotation_fcurve_keys(rot, leftRotation, rightRotation)
+      curves.append(("rotation_quaternion", frames, values, 'LINEAR'))
+    actions.append(get_shared_action("AnimationArg{}".format(arg), arg, curves, cache))
   # Return these new actions
   return actions
 
 
-def get_actions_for_node(node):
-  """Accepts a node and gets or creates actions to apply their animations"""
+def get_actions_for_node(node, cache=None):
+  """Accepts a node and gets or creates actions to apply their animations.
+  With an ImportCache, nodes with identical animations share actions"""
   
   # Don't do this twice
   if hasattr(node, "actions") and node.actions:
@@ -374,9 +470,9 @@ def get_actions_for_node(node):
   else:
     actions = []
     if isinstance(node, ArgVisibilityNode):
-      actions = create_visibility_actions(node)
+      actions = create_visibility_actions(node, cache)
     if isinstance(node, ArgAnimationNode):
-      actions = create_arganimation_actions(node)
+      actions = create_arganimation_actions(node, cache)
     # Save these actions on the node
     node.actions = actions
 
@@ -410,22 +506,40 @@ def _find_texture_file(name):
   textureFilename = files[0]
   return os.path.abspath(textureFilename)
 
-def create_material(material):
-  """Create a blender material from an EDM one"""
+def _material_key(material):
+  """Builds a hashable key that is identical for identical EDM materials"""
+  uniforms = tuple(sorted((k, tuple(v) if hasattr(v, "__iter__") else v)
+                          for k, v in material.uniforms.items()))
+  return (material.name, material.material_name, material.blending,
+          material.shadows.cast, material.shadows.receive, material.shadows.cast_only,
+          tuple(sorted((x.index, x.name) for x in material.textures)), uniforms)
+
+def create_material(material, cache=None):
+  """Create a blender material from an EDM one. If a cache is given, then an
+  identical material created previously will be reused."""
   # Find the actual file for the texture name
   if len(material.textures) == 0:
     return None
 
+  if cache is not None:
+    key = _material_key(material)
+    if key in cache.materials:
+      return cache.materials[key]
+
   diffuse_texture = next(x for x in material.textures if x.index == 0)
 
   name = diffuse_texture.name
-  tex = bpy.data.textures.get(name)
+  tex = cache.textures.get(name) if cache is not None else None
+  if not tex:
+    tex = bpy.data.textures.get(name)
   if not tex:
     filename = _find_texture_file(name)
     tex = bpy.data.textures.new(name, type="IMAGE")
     if filename:
       tex.image = bpy.data.images.load(filename)
       tex.image.use_alpha = False
+  if cache is not None:
+    cache.textures[name] = tex
 
   # Create material
   mat = bpy.data.materials.new(material.name)
@@ -458,6 +572,8 @@ def create_material(material):
   mtex.texture_coords = "UV"
   mtex.use_map_color_diffuse = True
 
+  if cache is not None:
+    cache.materials[key] = mat
   return mat
 
 
@@ -505,12 +621,19 @@ def _create_mesh(vertexData, indexData, vertexFormat):
   # Extract where the indices are
   posIndex = vertexFormat.position_indices
   normIndex = vertexFormat.normal_indices
+  # Convert every position and normal to blender space in one go
+  if new_vertices:
+    vertexArray = np.asarray(new_vertices, dtype=float).reshape(len(new_vertices), -1)
+  else:
+    vertexArray = np.zeros((0, max(list(posIndex) + list(normIndex or [])) + 1))
+  positions = vectors_to_blender(vertexArray[:, posIndex]).tolist()
+  normals = vectors_to_blender(vertexArray[:, normIndex]).tolist() if normIndex else None
+
   # Create the BMesh vertices, optionally with normals
-  for i, vtx in enumerate(new_vertices):
-    pos = vector_to_blender(Vector(vtx[x] for x in posIndex))
+  for i, pos in enumerate(positions):
     vert = bm.verts.new(pos)
-    if normIndex:
-      vert.normal = vector_to_blender(Vector(vtx[x] for x in normIndex))
+    if normals:
+      vert.normal = normals[i]
 
   bm.verts.ensure_lookup_table()
 
@@ -6,7 +6,8 @@ Holds the translation tree that we use to step to/from blender/edm forms
 
 from inspect import isgenerator
 
-from .utils import get_all_parents, get_root_object
+from .utils import get_all_parents, get_root_object, tree_prefixes
+from .edm.containers import OrderedSet
 
 
 _prefixLookup = {"transform": "tf", "CONNECTORS": "cn", "RENDER_NODES": "rn", "SHELL_NODES": "shell", "LIGHT_NODES": "light"}
@@ -46,7 +47,7 @@ class TranslationNode(object):
     self.transform = transform
     self.parent = None
     self.graph = None
-    self.children = []
+    self.children = OrderedSet()
 
   def insert_parent(self):
     return self.graph.insert_new_parent(self)
@@ -71,7 +72,7 @@ class RootTranslationNode(TranslationNode):
     self.transform = None
     self.render = None
     self.blender = None
-    self.children = []
+    self.children = OrderedSet()
     self.parent = None
   @property
   def name(self):
@@ -79,28 +80,20 @@ class RootTranslationNode(TranslationNode):
 
 class TranslationGraph(object):
   def __init__(self):
-    self.nodes = [RootTranslationNode()]
-    self.root = self.nodes[0]
+    # Every node in the graph, in the order added. Membership tests and
+    # removal are constant time, so graphs can be rewritten in linear time
+    self.root = RootTranslationNode()
+    self.nodes = OrderedSet([self.root])
 
   def print_tree(self, inspector=None):
     """Prints a graph of the tree, optionally with an inspection function"""
-
-    def _printNode(node, prefix=None, last=True):
-      if prefix is None:
-        firstPre = ""
-        prefix = ""
-      else:
-        firstPre = prefix + (" ┗━" if last else " ┣━")
-        prefix = prefix + ("   " if last else " ┃ ")
+    if not self.root:
+      return
+    for node, firstPre, prefix in tree_prefixes(self.root):
       print(firstPre + node.name.ljust(30-len(firstPre)) + " Render: " + str(node.render).ljust(30) + " Trans: " + str(node.transform))
       if inspector is not None:
         inspectPrefix = (" ┃ " if node.children else "   ")
         inspector(node, prefix + inspectPrefix)
-      for child in node.children:
-        _printNode(child, prefix, child is node.children[-1])
-
-    if self.root:
-      _printNode(self.root)
 
   def walk_tree(self, walker, include_root=True):
     """Accepts a function, and calls it for every node in the tree depth first.
@@ -110,8 +103,11 @@ class TranslationGraph(object):
     between the original and the current node. Anything else is undefined.
 
     If the walker function is a generator, it will be called twice; once
-    before, and once after the children are walked."""
-    def _walk_node(node):
+    before, and once after the children are walked.
+
+    The walk uses an explicit stack rather than recursion, so is not limited
+    by the depth of the tree."""
+    def _enter(node):
       ret = walker(node)
       if isgenerator(ret):
         try:
@@ -119,8 +115,11 @@ class TranslationGraph(object):
         except StopIteration:
           # Is a generator, but only one return value for this node
           ret = None
-      for child in list(node.children):
-        _walk_node(child)
+      # The children are only read after the first call, so that changes made
+      # by the walker are respected
+      return ret, iter(list(node.children))
+
+    def _leave(ret):
       # If this was a generator, we need to call again but this must be the
       # last time
       if isgenerator(ret):
@@ -131,11 +130,17 @@ class TranslationGraph(object):
         else:
           raise RuntimeError("Tree walker generator did not terminate on second call")
 
-    if include_root:
-      _walk_node(self.root)
-    else:
-      for root in list(self.root.children):
-        _walk_node(root)
+    roots = [self.root] if include_root else list(self.root.children)
+    for root in roots:
+      stack = [_enter(root)]
+      while stack:
+        ret, children = stack[-1]
+        child = next(children, None)
+        if child is not None:
+          stack.append(_enter(child))
+        else:
+          stack.pop()
+          _leave(ret)
 
   def attach_node(self, node, parent):
     """Adds a new child to a parent node"""
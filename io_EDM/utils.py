@@ -2,6 +2,11 @@
 
 import contextlib, os
 
+import numpy as np
+
+# Blender's stored values of the keyframe interpolation enum, for bulk access
+KEYFRAME_INTERPOLATION = {"CONSTANT": 0, "LINEAR": 1, "BEZIER": 2}
+
 @contextlib.contextmanager
 def chdir(to):
     original = os.getcwd()
@@ -16,14 +21,20 @@ def get_all_parents(objects):
   Gets a set of all direct ancestors of all objects passed in.
   This will work as long as the objects have a single 'parent' attribute that
   either points to the tree parent, or is None.
+
+  Each ancestry is only followed until it reaches an object already in the
+  set, so shared ancestors are visited once and the whole is linear in the
+  number of objects found.
   """
   objs = set()
   if not hasattr(objects, "__iter__"):
     objects = [objects]
   for item in objects:
-    objs.add(item)
-    if item.parent:
-      objs.update(get_all_parents(item.parent))
+    while not item in objs:
+      objs.add(item)
+      if not item.parent:
+        break
+      item = item.parent
   return objs
 
 def get_root_object(obj):
@@ -57,21 +68,110 @@ def vector_string(vec):
   return "[ " + s + " ]"
 
 
-def print_edm_graph(root, inspector=None):
-  """Prints a graph of the tree, optionally with an inspection function"""
+def tree_prefixes(root):
+  """Iterates over a tree depth-first, without recursion, for printing it.
 
-  def _printNode(node, prefix=None, last=True):
+  Yields (node, first, prefix) for every node, parents before children,
+  where first is the box-drawing prefix for the line naming the node and
+  prefix the one for any further lines belonging to it."""
+  stack = [(root, None, True)]
+  while stack:
+    node, prefix, last = stack.pop()
     if prefix is None:
-      firstPre = ""
+      first = ""
       prefix = ""
     else:
-      firstPre = prefix + (" ┗━" if last else " ┣━")
+      first = prefix + (" ┗━" if last else " ┣━")
       prefix = prefix + ("   " if last else " ┃ ")
-    print(firstPre + repr(node))
+    yield node, first, prefix
+    # Pushed in reverse, so that the first child is printed first
+    children = list(node.children)
+    for i in reversed(range(len(children))):
+      stack.append((children[i], prefix, i == len(children) - 1))
+
+def print_edm_graph(root, inspector=None):
+  """Prints a graph of the tree, optionally with an inspection function"""
+  for node, first, prefix in tree_prefixes(root):
+    print(first + repr(node))
     if inspector is not None:
       inspectPrefix = (" ┃ " if node.children else "   ")
       inspector(node, prefix + inspectPrefix)
-    for child in node.children:
-      _printNode(child, prefix, child is node.children[-1])
 
-  _printNode(root)
\ No newline at end of file
+def fcurve_keyframes(curve):
+  """Reads the keyframes of an fcurve with foreach_get.
+
+  Returns a tuple of the frames and values as float arrays, and the
+  KEYFRAME_INTERPOLATION value of each key, or -1 for other modes."""
+  points = curve.keyframe_points
+  co = np.zeros(len(points) * 2, dtype=np.float32)
+  points.foreach_get("co", co)
+  modes = np.zeros(len(points), dtype=np.int32)
+  try:
+    points.foreach_get("interpolation", modes)
+    # Easing modes (SINE, BACK...) come back as their raw enum values
+    modes[modes > max(KEYFRAME_INTERPOLATION.values())] = -1
+  except (TypeError, RuntimeError):
+    # Not every blender version allows bulk access to enum properties
+    modes[:] = [KEYFRAME_INTERPOLATION.get(x.interpolation, -1) for x in points]
+  co = co.astype(float).reshape(-1, 2)
+  return co[:, 0], co[:, 1], modes
+
+def sample_fcurve(curve, times, keyframes=None):
+  """Evaluates an fcurve at an array of frames.
+
+  Linear and constant segments are interpolated in bulk, and the value at a
+  key's own frame is the key's value, so fcurve.evaluate is only called for
+  times that fall inside other (e.g. bezier) segments, or beyond the ends of
+  curves with linear extrapolation. Curves with modifiers are always
+  evaluated per frame. keyframes is the result of fcurve_keyframes, if
+  already known."""
+  times = np.asarray(times, dtype=float)
+  if len(curve.modifiers):
+    return np.array([curve.evaluate(x) for x in times.tolist()], dtype=float)
+  frames, values, modes = keyframes if keyframes is not None else fcurve_keyframes(curve)
+  if not len(frames):
+    return np.array([curve.evaluate(x) for x in times.tolist()], dtype=float)
+  order = np.argsort(frames, kind="mergesort")
+  frames, values, modes = frames[order], values[order], modes[order]
+
+  # The segment each time falls in, named by the key that starts it
+  segment = np.clip(np.searchsorted(frames, times, side="right") - 1, 0, len(frames) - 1)
+  result = np.interp(times, frames, values)
+  constant = modes[segment] == KEYFRAME_INTERPOLATION["CONSTANT"]
+  result[constant] = values[segment[constant]]
+
+  # np.interp holds the end values beyond the keys, as constant extrapolation does
+  outside = (times < frames[0]) | (times > frames[-1])
+  onKey = frames[segment] == times
+  slow = ~onKey & ~outside & ~constant & (modes[segment] != KEYFRAME_INTERPOLATION["LINEAR"])
+  if curve.extrapolation != "CONSTANT":
+    slow |= outside
+  for index in np.nonzero(slow)[0].tolist():
+    result[index] = curve.evaluate(float(times[index]))
+  return result
+
+def create_phase_timer(operation, filenames, options={}):
+  """Creates a PhaseTimer for an import or export of one or more files. If
+  the 'profile' option is set, every phase is profiled with cProfile and the
+  stats dumped alongside the (first) file"""
+  from . import bl_info
+  from .edm.timing import PhaseTimer
+  first = filenames[0]
+  profileDir = os.path.dirname(os.path.abspath(first)) if options.get("profile", False) else None
+  return PhaseTimer(operation, filenames if len(filenames) > 1 else first,
+                    profile_dir=profileDir, version=bl_info["version"])
+
+def finish_phase_timer(timer, options={}):
+  """Prints the timings of a completed operation and, if the 'timing' option
+  is set, writes them to a JSON sidecar next to the (first) file"""
+  print(timer.report())
+  if not options.get("timing", False):
+    return
+  filenames = timer.filename if isinstance(timer.filename, list) else [timer.filename]
+  if len(filenames) == 1:
+    sidecar = filenames[0] + ".timing.json"
+  else:
+    sidecar = os.path.join(os.path.dirname(os.path.abspath(filenames[0])),
+                           "edm_{}.timing.json".format(timer.operation))
+  timer.write_json(sidecar)
+  print("Wrote timings to {}".format(sidecar))
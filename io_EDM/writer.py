@@ -1,14 +1,19 @@
 
 import bpy
 
-import itertools
 from collections import Counter
 import os
 
+import numpy as np
+
 from .edm.types import *
-from .edm.mathtypes import Matrix, vector_to_edm, matrix_to_edm, Vector, MatrixScale, matrix_to_blender
+from .edm.mathtypes import (Matrix, vector_to_edm, matrix_to_edm, Vector, MatrixScale, matrix_to_blender,
+                            vectors_to_edm, matrices_to_edm, quaternions_multiply)
 from .edm.basewriter import BaseWriter
-from .utils import matrix_string, vector_string, print_edm_graph
+from .edm.containers import OrderedSet
+from .edm.keyreduce import reduce_animation_keys, reduction_report
+from .utils import (matrix_string, vector_string, print_edm_graph, create_phase_timer, finish_phase_timer,
+                    fcurve_keyframes, sample_fcurve)
 
 from .translation import TranslationGraph, TranslationNode
 
@@ -108,17 +113,28 @@ def convert_node(node):
     node.transform.level = levels
 
 def write_file(filename, options={}):
+  # A dry run writes nothing to disk, including timing and profile files
+  if options.get("dry_run", False) and (options.get("timing", False) or options.get("profile", False)):
+    print("Dry run: timings are only printed, and steps are not profiled")
+    options = dict(options, timing=False, profile=False)
+  timer = create_phase_timer("export", [filename], options)
 
   # Get a set of all objects to be exported as renderables
-  allExport = _get_all_objects_to_export()  
+  with timer.phase("collect") as phase:
+    allExport = _get_all_objects_to_export()  
+    phase["objects"] = len(allExport)
   print("Writing {} objects".format(len(allExport)))
 
   # Build a graph from ALL blender objects we want ported across
-  graph = TranslationGraph.from_blender_objects(allExport)
+  with timer.phase("build_graph") as phase:
+    graph = TranslationGraph.from_blender_objects(allExport)
+    phase["nodes"] = len(graph.nodes)
   print("Blender graph we are exporting:")
   graph.print_tree()
 
-  graph.walk_tree(convert_node, include_root=True)
+  with timer.phase("convert_node") as phase:
+    graph.walk_tree(convert_node, include_root=True)
+    phase["nodes"] = len(graph.nodes)
 
 
   # Generate the materials for every renderable
@@ -136,7 +152,9 @@ def write_file(filename, options={}):
       materials.append(edmMaterial)
       edmMaterials[blendMaterial] = edmMaterial
     node.render.material = edmMaterial
-  graph.walk_tree(_create_materials)
+  with timer.phase("materials") as phase:
+    graph.walk_tree(_create_materials)
+    phase["materials"] = len(materials)
   del edmMaterials
 
 
@@ -157,7 +175,8 @@ def write_file(filename, options={}):
       assert node.parent.transform
       node.transform.parent = node.parent.transform
 
-  graph.walk_tree(_connect_parents)
+  with timer.phase("connect_parents"):
+    graph.walk_tree(_connect_parents)
 
 
   # Calculate materials for every RenderNode
@@ -180,26 +199,42 @@ def write_file(filename, options={}):
   def _enmesh(node):
     if node.render and hasattr(node.render, "calculate_mesh"):
       node.render.calculate_mesh(options)
-  graph.walk_tree(_enmesh)
+  with timer.phase("enmesh"):
+    graph.walk_tree(_enmesh)
 
   # Build the linear list of transformation nodes and render nodes
   allNodes = {x: [] for x in NodeCategory}
+  seenTransforms = set()
   def _flatten_graph(node):
     # Tie the edm-only objects toether into a graph to let us iterate it
     if node.render and not hasattr(node.render, "children"):
-      node.render.children = []
+      node.render.children = OrderedSet()
     if node.transform and not hasattr(node.transform, "children"):
-      node.transform.children = []
+      node.transform.children = OrderedSet()
 
     if node.render:
       allNodes[node.render.category].append(node.render)
       node.render.parent.children.append(node.render)
     if node.transform:
-      if not node.transform in allNodes[NodeCategory.transform]:
+      if not node.transform in seenTransforms:
+        seenTransforms.add(node.transform)
         allNodes[NodeCategory.transform].append(node.transform)
       if node.transform.parent:
         node.transform.parent.children.append(node.transform)
-  graph.walk_tree(_flatten_graph, include_root=True)
+  with timer.phase("flatten") as phase:
+    graph.walk_tree(_flatten_graph, include_root=True)
+    for category, nodes in allNodes.items():
+      phase[category.name] = len(nodes)
+
+  # Drop animation keys that interpolation between their neighbours recreates
+  if options.get("reduce_keys", False):
+    with timer.phase("reduce_keys") as phase:
+      stats = reduce_animation_keys(allNodes[NodeCategory.transform],
+        position_tolerance=options.get("key_position_tolerance", 1e-4),
+        angle_tolerance=options.get("key_angle_tolerance", 1e-4))
+      phase["keys_before"] = sum(x[0] for x in stats.values())
+      phase["keys_after"] = sum(x[1] for x in stats.values())
+    print(reduction_report(stats))
 
   # We should now have an entirely separate tree ready for writing
   print("Final EDM Graph for writing:")
@@ -220,9 +255,14 @@ def write_file(filename, options={}):
   file.shellNodes = allNodes[NodeCategory.shell]
   file.lightNodes = allNodes[NodeCategory.light]
   
-  writer = BaseWriter(filename)
-  file.write(writer)
-  writer.close()
+  with timer.phase("write") as phase:
+    writer = BaseWriter(filename, dry_run=options.get("dry_run", False))
+    file.write(writer)
+    phase["bytes"] = writer.tell()
+    writer.close()
+  if options.get("size_report", False) or options.get("dry_run", False):
+    print(writer.size_report())
+  finish_phase_timer(timer, options)
 
 def _get_all_objects_to_export():
   """Get all blender objects that will be exported as edm objects"""
@@ -361,30 +401,32 @@ def create_arganimation_node(object, actions):
 
   assert len(actions) == 1
   for action in actions:
-    curves = set(x.data_path for x in action.fcurves)
-    rotCurves = [x for x in action.fcurves if x.data_path == "rotation_quaternion"]
-    posCurves = [x for x in action.fcurves if x.data_path == "location"]
+    # Resolve the channels, and read every keyframe, once per action
+    channels = fcurve_channels(action)
+    keyframes = {key: fcurve_keyframes(curve) for key, curve in channels.items()}
+    paths = set(path for path, _ in channels)
     argument = action.argument
 
-    # What we should scale to - take the maximum keyframe value as '1.0'
-    scale = 1.0 / (max(abs(x) for x in get_all_keyframe_times(posCurves + rotCurves)) or 100.0)
+    # What we should scale to - take the maximum keyframe value as '1.0'
+    allTimes = get_keyframe_times(keyframes, ("location", "rotation_quaternion"))
+    scale = 1.0 / ((np.abs(allTimes).max() if len(allTimes) else 0.0) or 100.0)
     
-    if "location" in curves:
-      # Build up a set of keys
-      posKeys = []
-      # Build up the key data for everything
-      for time in get_all_keyframe_times(posCurves):
-        position = get_fcurve_position(posCurves, time, node.base.position) - node.base.position
-        key = PositionKey(frame=time*scale, value=position)
-        posKeys.append(key)
+    if "location" in paths:
+      # Build up the key data for everything, relative to the base position
+      times = get_keyframe_times(keyframes, ("location",))
+      positions = sample_channels(channels, keyframes, "location", times, list(node.base.position))
+      posKeys = KeyTrack.from_arrays(PositionKey, times * scale, positions - list(node.base.position))
       node.posData.append((argument, posKeys))
-    if "rotation_quaternion" in curves:
-      rotKeys = []
-      for time in get_all_keyframe_times(rotCurves):
-        actual = get_fcurve_quaternion(rotCurves, time)
-        rotation = inverse_base_rotation * invMatQuat * actual
-        key = RotationKey(frame=time*scale, value=rotation)
-        rotKeys.append(key)
+    if "rotation_quaternion" in paths:
+      # Really, quaternion rotation without all channels is stupid
+      assert all(("rotation_quaternion", i) in channels for i in range(4)), \
+        "Incomplete quaternion rotation channels in action"
+      times = get_keyframe_times(keyframes, ("rotation_quaternion",))
+      actual = sample_channels(channels, keyframes, "rotation_quaternion", times, [0.0]*4)
+      # Remove the base rotations from every key at once
+      baseRotation = list(inverse_base_rotation * invMatQuat)
+      rotKeys = KeyTrack.from_arrays(RotationKey, times * scale,
+                                     quaternions_multiply(baseRotation, actual))
 
 # leftRotation = matQuat * q1
 #     rightRotation = RX
@@ -394,55 +436,48 @@ def create_arganimation_node(object, actions):
         # print("   Quat at time {:6}: {}".format(time, predict))
         # print("                Desired {}".format(actual))
       node.rotData.append((argument, rotKeys))
-    if "scale" in curves:
+    if "scale" in paths:
       raise NotImplementedError("Curves not totally understood yet")
 
   # Now we've processed everything
   return node
 
 
-def get_all_keyframe_times(fcurves):
-  """Get all fixed-point times in a collection of keyframes"""
-  times = set()
-  for curve in fcurves:
-    for keyframe in curve.keyframe_points:
-      times.add(keyframe.co[0])
-  return sorted(times)
-
-def get_fcurve_quaternion(fcurves, frame):
-  """Retrieve an evaluated quaternion for a single action at a single frame"""
-  # Get each channel for the quaternion
-  all_quat = [x for x in fcurves if x.data_path == "rotation_quaternion"]
-  # Really, quaternion rotation without all channels is stupid
-  assert len(all_quat) == 4, "Incomplete quaternion rotation channels in action"
-  channels = [[x for x in all_quat if x.array_index == index][0] for index in range(4)]
-  return Quaternion([channels[i].evaluate(frame) for i in range(4)])
-
-def get_fcurve_position(fcurves, frame, basis=None):
-  """Retrieve an evaluated fcurve for position"""
-  all_quat = [x for x in fcurves if x.data_path == "location"]
-  channelL = [[x for x in all_quat if x.array_index == index] for index in range(3)]
-  # Get an array of lookups to get the channel value, or zero
-  channels = []
-  for index in range(3):
-    if channelL[index]:
-      channels.append(channelL[index][0].evaluate(frame))
-    elif basis:
-      channels.append(basis[index])
+def fcurve_channels(action):
+  """Maps the (data_path, array_index) of every channel in an action to its
+  fcurve. If a channel has several curves, the first is used"""
+  channels = {}
+  for curve in action.fcurves:
+    channels.setdefault((curve.data_path, curve.array_index), curve)
+  return channels
+
+def get_keyframe_times(keyframes, data_paths):
+  """Gets the sorted, distinct key frames of every channel on some data paths,
+  from a dictionary of channel: fcurve_keyframes result"""
+  frames = [value[0] for key, value in keyframes.items() if key[0] in data_paths]
+  return np.unique(np.concatenate(frames)) if frames else np.zeros(0)
+
+def sample_channels(channels, keyframes, data_path, times, defaults):
+  """Evaluates every channel of a data path at an array of times, as a
+  (times, len(defaults)) array. Missing channels take their default value"""
+  samples = np.empty((len(times), len(defaults)))
+  for index, default in enumerate(defaults):
+    key = (data_path, index)
+    if key in channels:
+      samples[:, index] = sample_fcurve(channels[key], times, keyframes[key])
     else:
-      channels.append(0)
-  return Vector(channels)
+      samples[:, index] = default
+  return samples
 
 def calculate_edm_world_bounds(objects):
   """Calculates, in EDM-space, the bounding box of all objects"""
-  mins = [1e38, 1e38, 1e38]
-  maxs = [-1e38, -1e38, -1e38]
-  for obj in objects:
-    points = [vector_to_edm(obj.matrix_world * Vector(x)) for x in obj.bound_box]
-    for index in range(3):
-      mins[index] = min([point[index] for point in points] + [mins[index]])
-      maxs[index] = max([point[index] for point in points] + [maxs[index]])
-  return Vector(mins), Vector(maxs)
+  if not objects:
+    return Vector([1e38]*3), Vector([-1e38]*3)
+  # The EDM-space world matrix of every object, applied to its bounding box
+  worlds = matrices_to_edm([[list(row) for row in obj.matrix_world] for obj in objects])
+  corners = np.array([[list(x) + [1.0] for x in obj.bound_box] for obj in objects])
+  points = np.einsum("nij,nkj->nki", worlds, corners)[..., :3].reshape(-1, 3)
+  return Vector(points.min(axis=0).tolist()), Vector(points.max(axis=0).tolist())
 
 def create_texture(source):
   # Get the texture name stripped of ALL extensions
@@ -480,7 +515,7 @@ def create_material(source):
   if source.raytrace_mirror.use:
     mat.uniforms["reflectionValue"] = source.raytrace_mirror.reflect_factor
     mat.uniforms["reflectionBlurring"] = 1.0-source.raytrace_mirror.gloss_factor
-  mat.shadows.recieve = source.use_shadows
+  mat.shadows.receive = source.use_shadows
   mat.shadows.cast = source.use_cast_shadows
   mat.shadows.cast_only = source.use_cast_shadows_only
 
@@ -535,56 +570,60 @@ def create_mesh_data(source, material=None, vertex_format=None, options={}):
   #   vfNormal = False
   #   vfTexture = False
 
-  if vertex_format.ntexture:
-    # Should be more complicated for multiple layers, but will do for now
-    uv_tex = mesh.tessface_uv_textures.active.data
-
-  if options.get("convert_axis", True):
+  convert_axis = options.get("convert_axis", True)
+  if convert_axis:
     print("  Converting axis")
   else:
     print("  NOT Converting axis")
 
-  newVertices = []
-  newIndexValues = []
-  # Loop over every face, and the UV data for that face
-  for faceIndex, face in enumerate(mesh.tessfaces):
-    # What are the new index values going to be?
-    newFaceIndex = [len(newVertices)+x for x in range(len(face.vertices))]
-    if vertex_format.ntexture:
-      uvFace = uv_tex[faceIndex]
-
-    # Build the new vertex data
-    for i, vtxIndex in enumerate(face.vertices):
-      vtxParts = []
-      if options.get("convert_axis", True):
-        position = vector_to_edm(mesh.vertices[vtxIndex].co)
-        normal = vector_to_edm(mesh.vertices[vtxIndex].normal)
-      else:
-        position = mesh.vertices[vtxIndex].co
-        normal = mesh.vertices[vtxIndex].normal
-      if vertex_format.nposition == 3:
-        vtxParts.append(list(position))
-      else:
-        vtxParts.append(list(position)+[0.0])
-      if vertex_format.nnormal:
-        vtxParts.append(normal)
-      if vertex_format.ntexture:
-        uv = [uvFace.uv[i][0], 1-uvFace.uv[i][1]]
-        vtxParts.append(uv)
-
-      newVertices.append(tuple(itertools.chain(*vtxParts)))
-
-    # We either have triangles or quads. Split into triangles, based on the
-    # vertex index subindex in face.vertices
-    if len(face.vertices) == 3:
-      triangles =  ((0, 1, 2),)
+  # Pull the mesh data out in bulk. Every tessface has four vertex index
+  # slots; the last is 0 for triangles (blender never puts vertex 0 there
+  # on a quad)
+  faceCount = len(mesh.tessfaces)
+  faceVertices = np.zeros(faceCount * 4, dtype=np.int32)
+  mesh.tessfaces.foreach_get("vertices_raw", faceVertices)
+  faceVertices = faceVertices.reshape(-1, 4)
+  isQuad = faceVertices[:, 3] != 0
+  # Which of the four slots of each face are real corners
+  cornerMask = np.ones((faceCount, 4), dtype=bool)
+  cornerMask[:, 3] = isQuad
+  corners = faceVertices[cornerMask]
+
+  vertexCount = len(mesh.vertices)
+  positions = np.zeros(vertexCount * 3, dtype=np.float32)
+  mesh.vertices.foreach_get("co", positions)
+  positions = positions.reshape(-1, 3)
+  normals = np.zeros(vertexCount * 3, dtype=np.float32)
+  mesh.vertices.foreach_get("normal", normals)
+  normals = normals.reshape(-1, 3)
+  if convert_axis:
+    positions = vectors_to_edm(positions)
+    normals = vectors_to_edm(normals)
+
+  # Every face corner becomes a separate vertex, in face order
+  columns = [positions[corners]]
+  if vertex_format.nposition > 3:
+    columns.append(np.zeros((len(corners), vertex_format.nposition - 3), dtype=np.float32))
+  if vertex_format.nnormal:
+    columns.append(normals[corners])
+  if vertex_format.ntexture:
+    # Should be more complicated for multiple layers, but will do for now
+    uvs = np.zeros(faceCount * 8, dtype=np.float32)
+    if mesh.tessface_uv_textures.active:
+      mesh.tessface_uv_textures.active.data.foreach_get("uv_raw", uvs)
     else:
-      triangles = ((0, 1, 2),(2, 3, 0))
-
-    # Write each vertex of each triangle
-    for tri in triangles:
-      for i in tri:
-        newIndexValues.append(newFaceIndex[i])
+      print("Warning: Object {} has no UV map; writing zero UVs".format(source.name))
+    uvs = uvs.reshape(-1, 4, 2)[cornerMask]
+    columns.append(np.column_stack([uvs[:, 0], 1 - uvs[:, 1]]))
+  newVertices = np.hstack(columns).astype(np.float32)
+
+  # We either have triangles or quads. Split into triangles, based on the
+  # vertex index subindex in face.vertices; (0, 1, 2) and, for quads, (2, 3, 0)
+  faceStart = np.cumsum(3 + isQuad) - (3 + isQuad)
+  triangles = faceStart[:, np.newaxis] + np.array([0, 1, 2, 2, 3, 0])
+  triangleMask = np.ones((faceCount, 6), dtype=bool)
+  triangleMask[:, 3:] = isQuad[:, np.newaxis]
+  newIndexValues = triangles[triangleMask].astype(np.uint32)
 
   # Cleanup
   bpy.data.meshes.remove(mesh)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+"""Headless benchmarks for the io_EDM.edm reader and writer.
+
+Times EDMFile parsing, EDMFile.write, EDMFile.audit, RenderNode.split and
+TranslationGraph construction on a fixed set of synthetic fixtures, and
+reports throughput and tracemalloc peak memory for each. Results can be
+saved as JSON, and compared against an earlier run to catch regressions,
+e.g.
+
+  python3 tests/benchmark.py -o before.json
+  (make changes)
+  python3 tests/benchmark.py --compare before.json --threshold 0.1
+
+which exits with an error if any benchmark became more than 10% slower.
+--graph-scaling instead checks that TranslationGraph editing time grows
+linearly with the number of nodes, failing if the time per node of the
+largest graph is more than GRAPH_SCALING_LIMIT times that of the smallest.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from io_EDM.edm import EDMFile
+from io_EDM.edm.basewriter import BaseWriter
+from io_EDM.edm.synthetic import generate_edm
+from io_EDM.edm.convert import write_edm
+from io_EDM.translation import TranslationGraph, TranslationNode
+
+# The generated fixtures, as name: generate_edm parameters. These must not be
+# changed, otherwise results stop being comparable with earlier runs
+FIXTURES = OrderedDict([
+  ("small",    dict(nodes=100, vertices=100)),
+  ("nodes",    dict(nodes=20000, depth=8, vertices=16)),
+  ("vertices", dict(nodes=10, vertices=50000)),
+  ("keys",     dict(nodes=1000, vertices=16, animated=1.0, keys=500)),
+  ("split",    dict(nodes=4000, vertices=64, split=8)),
+])
+
+def _object_count(edm):
+  return len(edm.nodes) + len(edm.renderNodes) + len(edm.shellNodes) + \
+         len(edm.connectors) + len(edm.root.materials)
+
+def _write_to_memory(edm):
+  stream = io.BytesIO()
+  edm.write(BaseWriter(stream=stream))
+  return stream
+
+def bench_parse(fixture):
+  """Parsing of the fixture file with EDMFile"""
+  edm = EDMFile(fixture["path"])
+  return (lambda: EDMFile(fixture["path"])), fixture["size"], _object_count(edm)
+
+def bench_write(fixture):
+  """Writing of the generated file with EDMFile.write, to memory. Parsed files
+  cannot (yet) be written back out, so this uses the objects as built"""
+  edm = fixture["built"]
+  return (lambda: _write_to_memory(edm)), fixture["size"], _object_count(edm)
+
+def bench_audit(fixture):
+  """Counting of the file index with EDMFile.audit"""
+  edm = EDMFile(fixture["path"])
+  return edm.audit, fixture["size"], _object_count(edm)
+
+def bench_split(fixture):
+  """Splitting of the multi-parent render nodes, as done when reading"""
+  nodes = [x for x in fixture["built"].renderNodes if x.parentData and len(x.parentData) > 1]
+  if not nodes:
+    return None
+  def _split():
+    for node in nodes:
+      node.split()
+  size = sum(x.vertexData.nbytes + x.indexData.nbytes for x in nodes)
+  return _split, size, sum(len(x.parentData) for x in nodes)
+
+def _build_translation_graph(edm):
+  """Builds a TranslationGraph from an EDMFile the way the importer does;
+  one node per transform, absorbing the first render node of each, with a
+  new parent inserted above every animated node as the exporter does"""
+  graph = TranslationGraph()
+  graph.root.transform = edm.nodes[0]
+  lookup = {edm.nodes[0]: graph.root}
+  for tfnode in edm.nodes[1:]:
+    node = TranslationNode(transform=tfnode)
+    graph.attach_node(node, lookup[tfnode.parent])
+    lookup[tfnode] = node
+  for rnode in edm.renderNodes:
+    parent = lookup.get(rnode.parent, graph.root)
+    graph.attach_node(TranslationNode(render=rnode), parent)
+  for node in list(graph.nodes):
+    if node.type == "RENDER" and node.parent.render is None:
+      node.parent.render = node.render
+      graph.remove_node(node)
+    elif node.transform is not None and node.transform.parent is not None and \
+         hasattr(node.transform, "posData"):
+      graph.insert_new_parent(node)
+  return graph
+
+def bench_graph(fixture):
+  """Building and rewriting a TranslationGraph of the fixture objects"""
+  edm = fixture["built"]
+  return (lambda: _build_translation_graph(edm)), fixture["size"], \
+         len(edm.nodes) + len(edm.renderNodes)
+
+BENCHMARKS = OrderedDict([
+  ("parse", bench_parse),
+  ("write", bench_write),
+  ("audit", bench_audit),
+  ("split", bench_split),
+  ("graph", bench_graph),
+])
+
+def create_fixture(directory, name):
+  """Generates a named fixture, and writes it into a directory"""
+  path = os.path.join(directory, name + ".edm")
+  edm = generate_edm(**FIXTURES[name])
+  write_edm(edm, path)
+  return {"path": path, "size": os.path.getsize(path), "built": edm}
+
+def measure(function, repeat):
+  """Runs a function repeat times, returning the best time, and then once
+  more under tracemalloc to find the peak memory allocated"""
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function()
+    times.append(time.perf_counter() - start)
+
+  tracemalloc.start()
+  try:
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+  return min(times), peak
+
+def run(directory, fixtures, benchmarks, repeat):
+  """Runs every benchmark on every fixture. Fixtures are generated one at a
+  time, to keep memory use down. Returns an ordered dictionary of
+  "fixture/benchmark": result dictionary"""
+  results = OrderedDict()
+  for fixtureName in fixtures:
+    fixture = create_fixture(directory, fixtureName)
+    for benchName in benchmarks:
+      prepared = BENCHMARKS[benchName](fixture)
+      if prepared is None:
+        continue
+      function, size, objects = prepared
+      seconds, peak = measure(function, repeat)
+      key = "{}/{}".format(fixtureName, benchName)
+      results[key] = OrderedDict([
+        ("seconds", seconds),
+        ("mb_per_s", size / 1e6 / seconds if seconds else 0.0),
+        ("objects_per_s", objects / seconds if seconds else 0.0),
+        ("peak_mb", peak / 1e6),
+      ])
+      print("{:<20} {:8.4f}s {:9.1f} MB/s {:12.0f} obj/s {:9.1f} MB peak".format(
+        key, seconds, results[key]["mb_per_s"], results[key]["objects_per_s"],
+        results[key]["peak_mb"]))
+  return results
+
+# Largest allowed growth in the time per node between the smallest and largest
+# graphs of --graph-scaling; quadratic behaviour over its 64x size range
+# would be far beyond this
+GRAPH_SCALING_LIMIT = 4.0
+
+def graph_scaling(sizes):
+  """Times TranslationGraph construction and rewriting on flat graphs of
+  increasing size, where every node is a direct child of the root - the
+  worst case for list-backed child collections. Returns a list of (size,
+  seconds); the time per node should stay roughly constant"""
+  results = []
+  print("\nTranslationGraph scaling (flat hierarchy):")
+  for size in sizes:
+    start = time.perf_counter()
+    graph = TranslationGraph()
+    nodes = []
+    for _ in range(size):
+      node = TranslationNode()
+      graph.attach_node(node, graph.root)
+      nodes.append(node)
+    for node in nodes[::2]:
+      graph.insert_new_parent(node)
+    for node in nodes[1::2]:
+      graph.remove_node(node)
+    seconds = time.perf_counter() - start
+    results.append((size, seconds))
+    print("{:>8} nodes {:8.4f}s {:8.2f} us/node".format(size, seconds, seconds / size * 1e6))
+  return results
+
+def compare(results, baseline, threshold):
+  """Compares timings against a baseline result set. Returns a list of the
+  benchmark names that were slower than the baseline by more than threshold"""
+  regressions = []
+  print("\nComparison with baseline:")
+  for key, result in results.items():
+    if not key in baseline:
+      continue
+    before, after = baseline[key]["seconds"], result["seconds"]
+    change = (after - before) / before if before else 0.0
+    flag = ""
+    if change > threshold:
+      regressions.append(key)
+      flag = "  REGRESSION"
+    print("{:<20} {:8.4f}s -> {:8.4f}s {:+7.1%}{}".format(key, before, after, change, flag))
+  return regressions
+
+def _main(args):
+  parser = argparse.ArgumentParser(description=__doc__,
+    formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+  parser.add_argument("--compare", metavar="JSON", help="Compare against earlier results")
+  parser.add_argument("--threshold", type=float, default=0.1,
+    help="Fractional slowdown counted as a regression. Default 0.1")
+  parser.add_argument("-r", "--repeat", type=int, default=3,
+    help="Timed runs of each benchmark; the best is reported")
+  parser.add_argument("-f", "--fixture", action="append", choices=list(FIXTURES),
+    help="Only run on this fixture. Can be given several times")
+  parser.add_argument("-b", "--benchmark", action="append", choices=list(BENCHMARKS),
+    help="Only run this benchmark. Can be given several times")
+  parser.add_argument("--fixture-dir", help="Keep the generated fixtures in this directory")
+  parser.add_argument("--graph-scaling", action="store_true",
+    help="Only check that TranslationGraph operations scale linearly with graph size")
+  options = parser.parse_args(args)
+
+  if options.graph_scaling:
+    results = graph_scaling([1000 * 2**i for i in range(7)])
+    (smallSize, smallTime), (largeSize, largeTime) = results[0], results[-1]
+    growth = (largeTime / largeSize) / (smallTime / smallSize)
+    print("Time per node grew {:.2f}x (limit {:.1f}x)".format(growth, GRAPH_SCALING_LIMIT))
+    if growth > GRAPH_SCALING_LIMIT:
+      print("TranslationGraph operations do not scale linearly")
+      return 1
+    return 0
+
+  directory = options.fixture_dir or tempfile.mkdtemp(prefix="edm_benchmark")
+  if not os.path.isdir(directory):
+    os.makedirs(directory)
+  try:
+    results = run(directory, options.fixture or list(FIXTURES),
+                  options.benchmark or list(BENCHMARKS), options.repeat)
+  finally:
+    if not options.fixture_dir:
+      shutil.rmtree(directory)
+
+  if options.output:
+    with open(options.output, "w") as f:
+      json.dump(OrderedDict([
+        ("python", platform.python_version()),
+        ("platform", platform.platform()),
+        ("time", time.strftime("%Y-%m-%d %H:%M:%S")),
+        ("results", results),
+      ]), f, indent=2)
+
+  if options.compare:
+    with open(options.compare) as f:
+      baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, options.threshold)
+    if regressions:
+      print("\n{} benchmarks regressed by more than {:.0%}".format(len(regressions), options.threshold))
+      return 1
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import io_EDM from the repository, without installing it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
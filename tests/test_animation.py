@@ -0,0 +1,134 @@
+"""Animation helpers: sampling fcurves, reducing and evaluating key tracks"""
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from io_EDM.edm import keyreduce
+from io_EDM.edm.builder import EDMBuilder
+from io_EDM.edm.pose import PoseEvaluator
+from io_EDM.edm.types import KeyTrack, PositionKey, RotationKey, key_arrays
+from io_EDM.utils import KEYFRAME_INTERPOLATION, fcurve_keyframes, sample_fcurve
+
+class _KeyframePoints(list):
+  """Stands in for fcurve.keyframe_points, with foreach_get"""
+  def foreach_get(self, attr, seq):
+    if attr == "co":
+      seq[:] = [c for key in self for c in key.co]
+    else:
+      seq[:] = [KEYFRAME_INTERPOLATION[key.interpolation] for key in self]
+
+class _FCurve(object):
+  """Stands in for a blender fcurve, evaluated one frame at a time. Bezier
+  segments are eased with smoothstep, which only needs to differ from linear"""
+  def __init__(self, frames, values, modes, extrapolation="CONSTANT"):
+    self.keyframe_points = _KeyframePoints(
+      SimpleNamespace(co=(f, v), interpolation=m) for f, v, m in zip(frames, values, modes))
+    self.modifiers = []
+    self.extrapolation = extrapolation
+    self.evaluations = 0
+
+  def evaluate(self, frame):
+    self.evaluations += 1
+    keys = sorted(self.keyframe_points, key=lambda x: x.co[0])
+    first, last = keys[0].co, keys[-1].co
+    if frame <= first[0] or frame >= last[0]:
+      (f0, v0), (f1, v1), end = (first, keys[1].co, first) if frame <= first[0] else (keys[-2].co, last, last)
+      if self.extrapolation == "CONSTANT":
+        return end[1]
+      return v0 + (v1 - v0) * (frame - f0) / (f1 - f0)
+    for key, after in zip(keys, keys[1:]):
+      (f0, v0), (f1, v1) = key.co, after.co
+      if f0 <= frame < f1:
+        t = (frame - f0) / (f1 - f0)
+        if key.interpolation == "CONSTANT":
+          return v0
+        if key.interpolation == "BEZIER":
+          t = t * t * (3 - 2 * t)
+        return v0 + (v1 - v0) * t
+
+def test_fcurve_sampling(count=300):
+  """sample_fcurve against evaluating the fcurve at every frame"""
+  random = np.random.RandomState(4)
+  frames = np.unique(random.randint(-100, 100, count)).astype(float)
+  values = random.normal(size=len(frames))
+  modes = random.choice(["LINEAR", "CONSTANT", "BEZIER"], len(frames)).tolist()
+  times = np.concatenate([frames, random.uniform(-150, 150, count)])
+  for extrapolation in ("CONSTANT", "LINEAR"):
+    curve = _FCurve(frames.tolist(), values.tolist(), modes, extrapolation)
+    expected = np.array([curve.evaluate(x) for x in times.tolist()])
+    curve.evaluations = 0
+    result = sample_fcurve(curve, times)
+    assert np.allclose(result, expected), "sample_fcurve differs ({} extrapolation)".format(extrapolation)
+    assert curve.evaluations < count, "sample_fcurve evaluated too many frames"
+
+def test_pose_wide_frames(count=6):
+  """PoseEvaluator against interpolating each track separately, for tracks
+  with key frames well outside -1 to 1"""
+  random = np.random.RandomState(7)
+  builder = EDMBuilder()
+  tracks = []
+  for i in range(count):
+    node = builder.add_animation(name="anim{}".format(i))
+    frames = np.sort(random.uniform(-20, 20, 8))
+    values = random.normal(size=(8, 3))
+    node.posData = [(0, KeyTrack.from_arrays(PositionKey, frames, values))]
+    tracks.append((frames, values))
+  evaluator = PoseEvaluator(builder.build())
+  for value in (-25.0, -3.5, 0.0, 1.0, 7.25, 30.0):
+    worlds = evaluator.world_matrices({0: value})
+    nodes = [x for x in evaluator.nodes if x.name.startswith("anim")]
+    for node, (frames, values) in zip(nodes, tracks):
+      expected = [np.interp(value, frames, values[:, i]) for i in range(3)]
+      assert np.allclose(worlds[node][:3, 3], expected), \
+        "{} posed wrongly at argument value {}".format(node.name, value)
+
+def test_key_reduction(count=600):
+  """reduce_keys only removes keys that interpolation recreates within the
+  tolerance, and removes every key of straight lines and slerp arcs"""
+  random = np.random.RandomState(6)
+  frames = np.linspace(-1, 1, count)
+  tolerance = 1e-3
+
+  line = np.outer(frames, [1.0, -2.0, 0.5])
+  assert keyreduce.reduce_keys(frames, line, tolerance).sum() == 2, "Straight line not reduced"
+  positions = np.cumsum(random.normal(scale=0.01, size=(count, 3)), axis=0)
+  keep = keyreduce.reduce_keys(frames, positions, tolerance)
+  rebuilt = np.column_stack([np.interp(frames, frames[keep], positions[keep, i]) for i in range(3)])
+  assert np.linalg.norm(rebuilt - positions, axis=1).max() <= tolerance, "Position error over tolerance"
+
+  angles = (frames + 1) * 0.75
+  arc = np.column_stack([np.cos(angles), np.sin(angles), np.zeros(count), np.zeros(count)])
+  assert keyreduce.reduce_keys(frames, arc, tolerance, keyreduce.rotation_errors).sum() == 2, \
+    "Slerp arc not reduced"
+  rotations = arc + np.cumsum(random.normal(scale=0.002, size=(count, 4)), axis=0)
+  rotations /= np.linalg.norm(rotations, axis=1)[:, np.newaxis]
+  keep = np.nonzero(keyreduce.reduce_keys(frames, rotations, tolerance, keyreduce.rotation_errors))[0]
+  for start, end in zip(keep, keep[1:]):
+    errors = keyreduce.rotation_errors(frames, rotations, start, end)
+    assert not len(errors) or errors.max() <= tolerance, "Rotation error over tolerance"
+
+def test_fcurve_keyframes_easing_modes():
+  # Bulk reads give the raw enum value of easing modes such as SINE
+  class Points(list):
+    def foreach_get(self, attr, seq):
+      seq[:] = [0, 0, 1, 1, 2, 2] if attr == "co" else [0, 5, 2]
+  frames, values, modes = fcurve_keyframes(SimpleNamespace(keyframe_points=Points([0, 1, 2])))
+  assert frames.tolist() == [0, 1, 2]
+  assert modes.tolist() == [0, -1, 2]
+
+def test_reduce_track():
+  frames = np.linspace(-1, 1, 50)
+  track = KeyTrack.from_arrays(PositionKey, frames, np.outer(frames, [1.0, 2.0, 3.0]))
+  reduced = keyreduce.reduce_track(track, PositionKey, 1e-6)
+  assert list(reduced.frames) == [-1.0, 1.0]
+  # Out of order tracks are left alone
+  unsorted = KeyTrack.from_arrays(RotationKey, frames[::-1], np.tile([1.0, 0, 0, 0], (50, 1)))
+  assert keyreduce.reduce_track(unsorted, RotationKey, 1e-6) is unsorted
+
+def test_key_track_append_after_key_arrays():
+  track = KeyTrack.from_arrays(PositionKey, [0.0, 1.0], np.zeros((2, 3)))
+  frames, values = key_arrays(track, 3)
+  track.append(PositionKey(frame=2.0, value=(1, 2, 3)))
+  assert frames.tolist() == [0.0, 1.0]
+  assert list(track.frames) == [0.0, 1.0, 2.0]
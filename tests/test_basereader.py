@@ -0,0 +1,51 @@
+"""BaseReader.read_records and the KeyTrack block readers"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from io_EDM.edm import types
+from io_EDM.edm.basereader import BaseReader
+from io_EDM.edm.types import KeyTrack, PositionKey, RotationKey
+
+def _reader(tmp_path, data):
+  path = tmp_path / "data.bin"
+  path.write_bytes(data)
+  return BaseReader(str(path))
+
+def test_read_records_struct(tmp_path):
+  reader = _reader(tmp_path, struct.pack("<2d2d", 1, 2, 3, 4))
+  assert reader.read_records("<2d", 2) == [(1.0, 2.0), (3.0, 4.0)]
+  reader.close()
+
+def test_read_records_dtype(tmp_path):
+  reader = _reader(tmp_path, struct.pack("<3I", 5, 6, 7))
+  assert reader.read_records(np.dtype("<u4"), 3).tolist() == [5, 6, 7]
+  reader.close()
+
+def test_read_records_short_read(tmp_path):
+  reader = _reader(tmp_path, struct.pack("<3d", 1, 2, 3))
+  with pytest.raises(IOError):
+    reader.read_records("<2d", 2)
+  reader.close()
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_key_track_read(tmp_path, monkeypatch, use_numpy):
+  if not use_numpy:
+    monkeypatch.setattr(types, "numpy", None)
+  # Rotation keys are stored as xyzw, and held as wxyz
+  reader = _reader(tmp_path, struct.pack("<5d5d", 0.0, 1, 2, 3, 4, 1.0, 5, 6, 7, 8))
+  track = KeyTrack.read(reader, RotationKey, 4, 2)
+  reader.close()
+  assert list(track.frames) == [0.0, 1.0]
+  assert list(track[1].value) == [8, 5, 6, 7]
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_key_track_truncated(tmp_path, monkeypatch, use_numpy):
+  if not use_numpy:
+    monkeypatch.setattr(types, "numpy", None)
+  reader = _reader(tmp_path, struct.pack("<8d", *range(8))[:-3])
+  with pytest.raises(IOError):
+    KeyTrack.read(reader, PositionKey, 3, 2)
+  reader.close()
@@ -0,0 +1,46 @@
+"""edm.builder.EDMBuilder"""
+
+import numpy as np
+import pytest
+
+from io_EDM.edm import EDMFile
+from io_EDM.edm.builder import EDMBuilder
+from io_EDM.edm.types import ArgAnimationNode, RenderNode
+
+def _quad():
+  positions = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=float)
+  return positions, np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)
+
+def test_build_and_read_back(tmp_path):
+  builder = EDMBuilder()
+  material = builder.add_material("mat", texture="tex")
+  parent = builder.add_animation(name="door",
+    position_keys={1: ([-1, 1], [[0, 0, 0], [0, 1, 0]])},
+    rotation_keys={2: ([0, 1], [[1, 0, 0, 0], [0, 1, 0, 0]])})
+  positions, indices = _quad()
+  builder.add_mesh(positions, indices, material=material, parent=parent, name="panel")
+  filename = str(tmp_path / "built.edm")
+  builder.write(filename)
+
+  edm = EDMFile(filename)
+  animated = [x for x in edm.nodes if isinstance(x, ArgAnimationNode)]
+  assert len(animated) == 1
+  assert [arg for arg, _ in animated[0].posData] == [1]
+  assert list(animated[0].rotData[0][1].frames) == [0.0, 1.0]
+  assert [x.name for x in edm.renderNodes if isinstance(x, RenderNode)] == ["panel"]
+
+@pytest.mark.parametrize("position_keys, rotation_keys", [
+  ({0: ([0, 2], np.zeros((2, 3)))}, {}),
+  ({0: ([1, 0], np.zeros((2, 3)))}, {}),
+  ({0: ([0, 1], np.zeros((2, 4)))}, {}),
+  ({}, {0: ([0, 1], np.zeros((2, 3)))}),
+  ({0: ([0, 0.5, 1], np.zeros((2, 3)))}, {}),
+])
+def test_invalid_animation_keys(position_keys, rotation_keys):
+  with pytest.raises(ValueError):
+    EDMBuilder().add_animation(position_keys=position_keys, rotation_keys=rotation_keys)
+
+def test_invalid_mesh_indices():
+  positions, indices = _quad()
+  with pytest.raises(ValueError):
+    EDMBuilder().add_mesh(positions, indices + 4)
@@ -0,0 +1,47 @@
+"""edm.containers.OrderedSet"""
+
+import copy
+
+import pytest
+
+from io_EDM.edm.containers import OrderedSet
+
+def test_keeps_insertion_order_without_duplicates():
+  items = OrderedSet([3, 1, 2])
+  items.append(1)
+  items.add(4)
+  items.extend([5, 3])
+  assert list(items) == [3, 1, 2, 4, 5]
+  assert list(reversed(items)) == [5, 4, 2, 1, 3]
+  assert len(items) == 5
+
+def test_remove_and_discard():
+  items = OrderedSet("abc")
+  items.remove("b")
+  assert list(items) == ["a", "c"]
+  with pytest.raises(ValueError):
+    items.remove("b")
+  items.discard("b")
+  items.discard("a")
+  assert list(items) == ["c"]
+  items.clear()
+  assert not items
+
+def test_indexing():
+  items = OrderedSet(range(5))
+  assert items[0] == 0
+  assert items[-1] == 4
+  assert items[2] == 2
+  assert items[1:3] == [1, 2]
+  with pytest.raises(IndexError):
+    items[5]
+
+def test_comparison_and_copies():
+  items = OrderedSet([1, 2])
+  assert items == [1, 2]
+  assert items == OrderedSet([1, 2])
+  assert items != OrderedSet([2, 1])
+  duplicate = copy.copy(items)
+  duplicate.append(3)
+  assert list(items) == [1, 2]
+  assert 3 in duplicate and 3 not in items
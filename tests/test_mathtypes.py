@@ -0,0 +1,61 @@
+"""The NumPy array kernels of edm.mathtypes against the scalar functions and
+Matrix/Quaternion operations they replace, and the fallback math types"""
+
+import pickle
+
+import numpy as np
+
+from io_EDM.edm import mathtypes
+from io_EDM.edm import fallbackmath
+
+def test_vector_kernels():
+  vectors = np.random.RandomState(0).uniform(-10, 10, (2000, 3))
+  for scalar, kernel in ((mathtypes.vector_to_edm, mathtypes.vectors_to_edm),
+                         (mathtypes.vector_to_blender, mathtypes.vectors_to_blender)):
+    expected = np.array([list(scalar(mathtypes.Vector(x))) for x in vectors])
+    assert np.allclose(kernel(vectors), expected), "{} differs".format(kernel.__name__)
+  assert np.allclose(mathtypes.vectors_to_blender(mathtypes.vectors_to_edm(vectors)), vectors)
+
+def test_matrix_kernels():
+  matrices = np.random.RandomState(1).uniform(-10, 10, (500, 4, 4))
+  for scalar, kernel in ((mathtypes.matrix_to_edm, mathtypes.matrices_to_edm),
+                         (mathtypes.matrix_to_blender, mathtypes.matrices_to_blender)):
+    expected = np.array([[list(row) for row in scalar(mathtypes.Matrix(x.tolist()))] for x in matrices])
+    assert np.allclose(kernel(matrices), expected), "{} differs".format(kernel.__name__)
+
+def test_quaternions_multiply():
+  random = np.random.RandomState(2)
+  left, right = random.normal(size=4), random.normal(size=4)
+  keys = random.normal(size=(500, 4))
+  Q = mathtypes.Quaternion
+  expected = np.array([list(Q(left.tolist()) * Q(x.tolist()) * Q(right.tolist())) for x in keys])
+  result = mathtypes.quaternions_multiply(mathtypes.quaternions_multiply(left, keys), right)
+  assert np.allclose(result, expected)
+
+def test_translation_products():
+  random = np.random.RandomState(3)
+  left = mathtypes.Matrix(random.normal(size=(4, 4)).tolist())
+  left[3][:] = [0, 0, 0, 1]
+  right = mathtypes.Matrix.Translation(random.normal(size=3).tolist()) * \
+          mathtypes.MatrixScale(random.uniform(0.5, 2, 3).tolist())
+  keys = random.normal(size=(500, 3))
+  expected = np.array([list((left * mathtypes.Matrix.Translation(x.tolist()) * right).translation)
+                       for x in keys])
+  assert np.allclose(mathtypes.translation_products(left, keys, right), expected)
+
+def test_fallback_decompose_round_trip():
+  Matrix, Quaternion = fallbackmath.Matrix, fallbackmath.Quaternion
+  rotation = Quaternion((0.2, 0.5, 0.1, -0.3)).normalized()
+  matrix = Matrix.Translation((1, 2, 3)) * rotation.to_matrix().to_4x4() * Matrix.Scale(2.0, 4)
+  translation, decomposed, scale = matrix.decompose()
+  assert np.allclose(list(translation), [1, 2, 3])
+  assert np.allclose(list(scale), [2, 2, 2])
+  assert np.allclose(list(decomposed), list(rotation)) or np.allclose(list(decomposed), list(-rotation))
+
+def test_fallback_decompose_gives_floats():
+  for part in fallbackmath.Matrix.Translation((1, 2, 3)).decompose():
+    assert all(type(x) is float for x in part)
+
+def test_fallback_matrix_pickles():
+  matrix = fallbackmath.Matrix.Translation((1, 2, 3))
+  assert pickle.loads(pickle.dumps(matrix)) == matrix
@@ -0,0 +1,84 @@
+"""Keyframe and action creation of the importer. These need blender's own
+python, e.g. blender -b --python-expr "import pytest; pytest.main(['tests'])"
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("bpy")
+
+from io_EDM import reader
+from io_EDM.utils import KEYFRAME_INTERPOLATION
+
+class _KeyframePoints(list):
+  """Stands in for fcurve.keyframe_points, with bulk add and foreach access"""
+  def add(self, count):
+    self.extend(SimpleNamespace(co=(0.0, 0.0), interpolation="BEZIER") for _ in range(count))
+
+  def foreach_get(self, attr, seq):
+    if attr == "co":
+      seq[:] = [c for key in self for c in key.co]
+    else:
+      seq[:] = [KEYFRAME_INTERPOLATION[key.interpolation] for key in self]
+
+  def foreach_set(self, attr, seq):
+    names = {v: k for k, v in KEYFRAME_INTERPOLATION.items()}
+    for i, key in enumerate(self):
+      if attr == "co":
+        key.co = (float(seq[2*i]), float(seq[2*i+1]))
+      else:
+        key.interpolation = names[int(seq[i])]
+
+class _FCurve(object):
+  def __init__(self, data_path=None, index=0):
+    self.data_path, self.index = data_path, index
+    self.keyframe_points = _KeyframePoints()
+    self.updates = 0
+
+  def update(self):
+    self.updates += 1
+
+class _Actions(list):
+  """Stands in for bpy.data.actions"""
+  def new(self, name):
+    curves = []
+    def new_curve(data_path, index):
+      curves.append(_FCurve(data_path, index))
+      return curves[-1]
+    action = SimpleNamespace(name=name, fcurves=SimpleNamespace(new=new_curve, curves=curves))
+    self.append(action)
+    return action
+
+def test_add_keyframes_appends():
+  curve = _FCurve()
+  reader.add_keyframes(curve, [0, 10], [1.0, 2.0], "LINEAR")
+  reader.add_keyframes(curve, [20], [3.0], "CONSTANT")
+  points = curve.keyframe_points
+  assert [x.co for x in points] == [(0, 1), (10, 2), (20, 3)]
+  assert [x.interpolation for x in points] == ["LINEAR", "LINEAR", "CONSTANT"]
+  assert curve.updates == 2
+
+  reader.add_keyframes(curve, [], [], "LINEAR")
+  assert len(points) == 3 and curve.updates == 2
+
+def test_get_shared_action_reuses_identical(monkeypatch):
+  actions = _Actions()
+  monkeypatch.setattr(reader.bpy, "data", SimpleNamespace(actions=actions))
+  cache = reader.ImportCache()
+  frames = np.array([-100.0, 100.0])
+  curves = [("location", frames, np.array([[0.0, 0, 0], [1, 2, 3]]), "LINEAR")]
+
+  action = reader.get_shared_action("move", 3, curves, cache)
+  assert action.argument == 3
+  assert [x.index for x in action.fcurves.curves] == [0, 1, 2]
+  assert [x.co for x in action.fcurves.curves[2].keyframe_points] == [(-100, 0), (100, 3)]
+
+  same = [("location", frames.copy(), np.array([[0.0, 0, 0], [1, 2, 3]]), "LINEAR")]
+  assert reader.get_shared_action("move", 3, same, cache) is action
+  assert reader.get_shared_action("move", 4, same, cache) is not action
+  other = [("location", frames, np.array([[0.0, 0, 0], [1, 2, 4]]), "LINEAR")]
+  assert reader.get_shared_action("move", 3, other, cache) is not action
+  assert reader.get_shared_action("move", 3, same) is not action
+  assert len(actions) == 4
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""Converts .edm files to glTF 2.0 or OBJ, or compiles glTF 2.0 and OBJ
+files into .edm, without needing blender.
+
+Directories given as input are searched recursively for files to convert,
+and their structure is mirrored in the output directory.
+"""
+
+import argparse
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from io_EDM.edm.convert import convert_files, find_jobs
+
+def _main(args):
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("inputs", nargs="+", metavar="input", help="Input files or directories")
+  parser.add_argument("-f", "--format", choices=["gltf", "obj", "edm"], default="gltf",
+    help="Output format. edm compiles .gltf/.glb/.obj inputs, the others convert .edm inputs")
+  parser.add_argument("-o", "--output", help="Output directory. Defaults to alongside the input")
+  parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes")
+  parser.add_argument("--lod", type=int, default=None, help="Only write this LOD level")
+  parser.add_argument("--shells", action="store_true", help="Include collision shells")
+  parser.add_argument("--texture-ext", default=".png", help="Extension for texture references")
+  parser.add_argument("--shell-prefix", default="collision",
+    help="When compiling, objects with names starting with this are collision shells")
+  options = parser.parse_args(args)
+
+  if options.format == "edm":
+    sources = {".gltf", ".glb", ".obj"}
+    formatOptions = {"shell_prefix": options.shell_prefix}
+  else:
+    sources = {".edm"}
+    formatOptions = {
+      "lod": options.lod,
+      "shells": options.shells,
+      "texture_extension": options.texture_ext,
+    }
+
+  jobs = find_jobs(options.inputs, options.output, "." + options.format, sources)
+  duplicates = sorted(x for x, count in Counter(x[1] for x in jobs).items() if count > 1)
+  if duplicates:
+    print("Error: Several inputs would be written to {}".format(", ".join(duplicates)))
+    return 1
+  print("Converting {} files".format(len(jobs)))
+  for target in set(os.path.dirname(x[1]) for x in jobs):
+    if target and not os.path.isdir(target):
+      os.makedirs(target)
+
+  errors = convert_files(jobs, processes=options.jobs, options=formatOptions)
+
+  if errors:
+    print("{} Errors occured:".format(len(errors)))
+    for filename, error in errors:
+      print("{}:\n{}".format(filename, error))
+    return 1
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(_main(sys.argv[1:]))
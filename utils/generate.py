@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+"""Writes a synthetic .edm file of configurable size, for benchmarking and
+stress testing the reader and writer without needing real models.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from io_EDM.edm.synthetic import generate_edm
+from io_EDM.edm.convert import write_edm
+
+def _main(args):
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("output", help="The .edm file to write")
+  parser.add_argument("-n", "--nodes", type=int, default=100, help="Number of transform nodes")
+  parser.add_argument("-d", "--depth", type=int, default=4, help="Maximum hierarchy depth")
+  parser.add_argument("-v", "--vertices", type=int, default=100, help="Approximate vertices per mesh")
+  parser.add_argument("-m", "--materials", type=int, default=4, help="Number of materials")
+  parser.add_argument("-k", "--keys", type=int, default=10, help="Animation keys per argument")
+  parser.add_argument("--animated", type=float, default=0.5,
+    help="Fraction of transform nodes that are animated")
+  parser.add_argument("--arguments", type=int, default=16, help="Number of animation arguments")
+  parser.add_argument("--split", type=int, default=1,
+    help="Number of transforms sharing each (split) render node")
+  parser.add_argument("--seed", type=int, default=0, help="Random seed")
+  options = parser.parse_args(args)
+
+  start = time.time()
+  edm = generate_edm(nodes=options.nodes, depth=options.depth, vertices=options.vertices,
+                     materials=options.materials, keys=options.keys, animated=options.animated,
+                     arguments=options.arguments, split=options.split, seed=options.seed)
+  built = time.time()
+  write_edm(edm, options.output)
+  end = time.time()
+
+  print("Wrote {} ({:.1f} MB): {} nodes, {} render nodes, {} vertices".format(
+    options.output, os.path.getsize(options.output) / 1e6, len(edm.nodes),
+    len(edm.renderNodes), sum(len(x.vertexData) for x in edm.renderNodes)))
+  print("Built in {:.2f}s, written in {:.2f}s".format(built - start, end - built))
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+"""Renders flat-shaded PNG preview images of .edm files, without needing
+blender.
+
+Directories given as input are searched recursively for .edm files, and
+their structure is mirrored in the output directory.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from io_EDM.edm.convert import find_jobs
+from io_EDM.edm.thumbnail import render_files
+
+def _argument_value(text):
+  """Parses an ARG=VALUE pair"""
+  arg, _, value = text.partition("=")
+  try:
+    return int(arg), float(value)
+  except ValueError:
+    raise argparse.ArgumentTypeError("Expected ARG=VALUE, got '{}'".format(text))
+
+def _main(args):
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("inputs", nargs="+", metavar="input", help="Input files or directories")
+  parser.add_argument("-o", "--output", help="Output directory. Defaults to alongside the input")
+  parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes")
+  parser.add_argument("-s", "--size", type=int, default=256, help="Image width and height in pixels")
+  parser.add_argument("--lod", type=int, default=0,
+    help="LOD level to draw, or -1 for all levels. Default 0")
+  parser.add_argument("--shells", action="store_true", help="Also draw collision shells")
+  parser.add_argument("--azimuth", type=float, default=45.0, help="View angle around the model")
+  parser.add_argument("--elevation", type=float, default=30.0, help="View angle above the model")
+  parser.add_argument("-a", "--arg", type=_argument_value, action="append", metavar="ARG=VALUE",
+    help="Pose the model with this animation argument value. Can be given several times")
+  options = parser.parse_args(args)
+
+  jobs = find_jobs(options.inputs, options.output, ".png", {".edm"})
+  print("Rendering {} files".format(len(jobs)))
+  for target in set(os.path.dirname(x[1]) for x in jobs):
+    if target and not os.path.isdir(target):
+      os.makedirs(target)
+
+  renderOptions = {
+    "size": options.size,
+    "lod": options.lod if options.lod >= 0 else None,
+    "shells": options.shells,
+    "azimuth": options.azimuth,
+    "elevation": options.elevation,
+    "arguments": dict(options.arg) if options.arg else None,
+  }
+  errors = render_files(jobs, processes=options.jobs, options=renderOptions)
+
+  if errors:
+    print("{} Errors occured:".format(len(errors)))
+    for filename, error in errors:
+      print("{}:\n{}".format(filename, error))
+    return 1
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(_main(sys.argv[1:]))